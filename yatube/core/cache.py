@@ -0,0 +1,247 @@
+"""Общий кэш для всех процессов и защита от «эффекта толпы».
+
+SQLiteCache хранит записи в отдельном файле SQLite в режиме WAL: все
+воркеры на машине видят одни и те же значения и инвалидации.
+LOCATION ':memory:' — база в памяти процесса, замена для разработки и
+тестов.
+
+fetch() — get_or_set с вероятностным досрочным пересчётом (XFetch) и
+слиянием одновременных промахов через блокировку в самом кэше: горячий
+ключ пересчитывает один запрос, остальные ждут его или отдают старое.
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shared = None
+        if location == ':memory:':
+            # Блокировки общей базы в памяти не ждут busy_timeout, а сразу
+            # падают: даём всем потокам одно соединение под замком.
+            self._shared = sqlite3.connect(
+                ':memory:', isolation_level=None, check_same_thread=False
+            )
+        self._path = location
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+
+    @contextmanager
+    def _connection(self):
+        if self._shared is not None:
+            with self._lock:
+                yield self._shared
+            return
+        # Для файла соединение своё у каждого потока и процесса: sqlite3
+        # нельзя делить между потоками и наследовать через fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            local.connection = connection
+            local.pid = os.getpid()
+        yield local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        marks = ', '.join('?' * len(keys))
+        with self._connection() as connection:
+            rows = connection.execute(
+                f'SELECT key, value FROM cache WHERE key IN ({marks}) '
+                f'AND (expires IS NULL OR expires > ?)',
+                (*keys, time.time()),
+            ).fetchall()
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dump(value), self._expires(timeout)),
+            )
+            self._maybe_cull(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._connection() as connection:
+            cursor = connection.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, expires = excluded.expires '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, self._dump(value), self._expires(timeout),
+                 time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._connection() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), key, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        # Чтение и запись под одной блокировкой записи: инкремент атомарен
+        # и между процессами.
+        with self._connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT value FROM cache WHERE key = ? '
+                    'AND (expires IS NULL OR expires > ?)',
+                    (key, time.time()),
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"Key '{key}' not found")
+                value = pickle.loads(row[0]) + delta
+                connection.execute(
+                    'UPDATE cache SET value = ? WHERE key = ?',
+                    (self._dump(value), key),
+                )
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def _dump(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _maybe_cull(self, connection):
+        # COUNT(*) на каждую запись дорог: проверяем примерно раз на сотню.
+        if random.random() > 0.01:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        count = connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+class DoNotCache(Exception):
+    """compute() для fetch() вернул результат, который нельзя хранить."""
+
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+
+def fetch(key, compute, timeout, cache=None, beta=1.0, is_valid=None,
+          lock_timeout=10, poll=0.02):
+    """Значение key из кэша или compute() не чаще одного раза на всех.
+
+    Запись считается устаревшей заранее с вероятностью, растущей к концу
+    TTL и с ценой пересчёта (XFetch, beta — агрессивность). is_valid
+    позволяет отбраковать запись иначе, например по версиям тегов;
+    тогда остальные получают старое значение, пока его пересчитывают.
+    """
+    cache = cache or default_cache
+    lock = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None:
+        value, cost, expires = entry
+        fresh = is_valid is None or is_valid(value)
+        early = expires is not None and (
+            time.time() - cost * beta * math.log(1 - random.random())
+            >= expires
+        )
+        if fresh and not early:
+            return value
+        if cache.add(lock, True, lock_timeout):
+            return _compute(cache, key, lock, compute, timeout)
+        return value
+    deadline = time.time() + lock_timeout
+    while not cache.add(lock, True, lock_timeout):
+        time.sleep(poll)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if time.time() >= deadline:
+            # Держатель блокировки, видимо, упал: считаем сами.
+            break
+    return _compute(cache, key, lock, compute, timeout)
+
+
+def _compute(cache, key, lock, compute, timeout):
+    # Блокировка снимается после записи: ждущие не застанут промежуток
+    # без значения и без блокировки.
+    try:
+        started = time.time()
+        try:
+            value = compute()
+        except DoNotCache as skip:
+            return skip.value
+        finished = time.time()
+        expires = finished + timeout if timeout is not None else None
+        cache.set(key, (value, finished - started, expires), timeout)
+        return value
+    finally:
+        cache.delete(lock)
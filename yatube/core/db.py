@@ -0,0 +1,135 @@
+"""Чтение с реплик, запись в основную базу.
+
+View, отмеченные reads_from_replica, читают с одной случайной реплики
+из DATABASE_REPLICAS; всё остальное, включая сессии и пользователей,
+идёт в default. После записи через view с pins_primary клиент получает
+куку, и REPLICA_PIN_SECONDS его чтения тоже идут в default: он видит
+свои изменения, даже если реплика отстаёт.
+
+Реплика не должна наполнять общие кэши. Запись сразу меняет версии
+кэша, а реплика ещё отдаёт старые данные: фрагменты {% cache %} и
+страницы анонимов сохранились бы под новой версией с данными до записи
+и до часа показывались бы всем, в том числе автору с кукой. Поэтому
+смена версий кэша вызывает note_write(), и следующие
+REPLICA_PIN_SECONDS все читают с default.
+Цена: пока сайт пишет чаще, чем раз в REPLICA_PIN_SECONDS, реплики
+простаивают; расчёт, как и у куки, на то, что реплика отстаёт меньше.
+
+Каждое новое соединение с SQLite получает PRAGMA из SQLITE_PRAGMAS, а
+короткие записи из view повторяются через retry_write, если база занята
+другим писателем.
+"""
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (
+    DEFAULT_DB_ALIAS, OperationalError, connections, transaction,
+)
+
+PIN_COOKIE = 'primary_pin'
+LAST_WRITE_KEY = 'core:db:last_write'
+# Приложения, которые читаются только с основной базы: свежая сессия или
+# только что созданный пользователь могли ещё не доехать до реплики.
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes'}
+
+_replica = ContextVar('replica', default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На всех алиасах одни и те же данные.
+        return True
+
+
+def note_write():
+    """Закэшированные данные изменились: REPLICA_PIN_SECONDS все
+    читают с default."""
+    cache.set(LAST_WRITE_KEY, time.time(), settings.REPLICA_PIN_SECONDS)
+
+
+def reads_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or PIN_COOKIE in request.COOKIES
+                or cache.get(LAST_WRITE_KEY) is not None):
+            return view(request, *args, **kwargs)
+        token = _replica.set(random.choice(replicas))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+    return wrapper
+
+
+def pins_primary(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        # Успешная запись во view проекта заканчивается редиректом.
+        if 300 <= response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+    return wrapper
+
+
+def check_connections(**kwargs):
+    """request_started: закрывает постоянные соединения, которые перестали
+    отвечать; Django откроет новое при первом запросе к базе."""
+    if not settings.CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created: настройки SQLite живут в соединении, а не в
+    файле (кроме journal_mode), поэтому ставятся при каждом подключении."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_write(write, using=DEFAULT_DB_ALIAS):
+    """Выполняет write() в транзакции, повторяя её, пока база занята.
+
+    Паузы растут экспоненциально от WRITE_RETRY_DELAY со случайным
+    разбросом, чтобы повторы писателей не совпадали. Внутри внешней
+    транзакции не повторяет: её снимок уже не обновить.
+    """
+    attempts = settings.WRITE_RETRY_ATTEMPTS
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic(using=using):
+                return write()
+        except OperationalError as error:
+            last = attempt == attempts - 1
+            if (not is_locked(error) or last
+                    or connections[using].in_atomic_block):
+                raise
+        delay = settings.WRITE_RETRY_DELAY * 2 ** attempt
+        time.sleep(delay * random.uniform(0.5, 1.5))
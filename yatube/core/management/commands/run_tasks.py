@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.tasks import claim, execute, requeue_stale
+from yatube.settings import TASK_WORKERS
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди (core.tasks). Без --burst '
+            'работает, пока его не остановят.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=TASK_WORKERS)
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='Потоки для задач с вводом-выводом, процессы — для '
+                 'тяжёлых вычислений вроде миниатюр.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда в очереди не останется готовых задач.',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if options['pool'] == 'process':
+            pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('fork')
+            )
+        else:
+            pool = ThreadPoolExecutor(workers, thread_name_prefix='tasks')
+        running = set()
+        results = {True: 0, False: 0}
+        try:
+            while True:
+                requeue_stale()
+                claimed = claim(workers - len(running))
+                if claimed and options['pool'] == 'process':
+                    # Дочерний процесс не должен унаследовать соединение.
+                    connection.close()
+                running.update(pool.submit(execute, pk) for pk in claimed)
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, running = wait(
+                    running,
+                    timeout=0 if claimed else options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    results[future.result()] += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown(wait=True)
+        self.stdout.write(
+            f'Выполнено задач: {results[True]}, с ошибкой: {results[False]}'
+        )
@@ -0,0 +1,187 @@
+"""Отдача загруженных файлов из MEDIA_ROOT.
+
+С MEDIA_ACCEL Django только проверяет запрос и ставит заголовки, а сам
+файл по X-Accel-Redirect (nginx) или X-Sendfile (Apache, lighttpd)
+отправляет фронтовый прокси. Без него файл уходит FileResponse:
+gunicorn и uWSGI через wsgi.file_wrapper шлют его os.sendfile без
+копирования в Python, в том числе кусок по Range.
+
+Имена картинок постов (core.storage) и миниатюр sorl — хеш содержимого,
+по такому адресу файл не меняется: браузеры и CDN кэшируют его на год
+без перепроверки (immutable).
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.exceptions import (ImproperlyConfigured,
+                                    SuspiciousFileOperation)
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# posts/ab/cd/abcd….jpg и cache/ab/cd/abcd….jpg.
+IMMUTABLE = re.compile(
+    r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{28,}\.\w+$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class MediaResponse(FileResponse):
+    # Когда сервер не умеет sendfile, файл читается крупными кусками.
+    block_size = 64 * 1024
+
+
+class FileRange:
+    """length байт открытого файла от текущей позиции.
+
+    fileno() остаётся: gunicorn отправит кусок os.sendfile с текущей
+    позиции, ограничив его Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(request, size, etag, last_modified):
+    """(начало, конец) из заголовка Range или None — отдать файл целиком.
+
+    Несколько диапазонов и битые заголовки RFC 7233 позволяет
+    игнорировать. Диапазон за концом файла — ValueError.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        return None
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        if int(last) == 0:
+            raise ValueError('Пустой диапазон')
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError('Диапазон за концом файла')
+    if end < start:
+        return None
+    return start, end
+
+
+def accel_response(path, full_path, content_type):
+    """Пустой ответ, файл к которому допишет прокси; Range тоже он."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+        )
+    elif settings.MEDIA_ACCEL == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        raise ImproperlyConfigured(
+            f'Неизвестный MEDIA_ACCEL: {settings.MEDIA_ACCEL}'
+        )
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag,
+                  last_modified):
+    try:
+        span = byte_range(request, size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(full_path, 'rb')
+    if span is None:
+        response = MediaResponse(file, content_type=content_type)
+    else:
+        start, end = span
+        file.seek(start)
+        response = MediaResponse(
+            FileRange(file, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(full_path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404('Файл не найден')
+    etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    last_modified = int(info.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        content_type = (
+            mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        )
+        if settings.MEDIA_ACCEL:
+            response = accel_response(path, full_path, content_type)
+        else:
+            response = file_response(
+                request, full_path, info.st_size, content_type, etag,
+                last_modified,
+            )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if IMMUTABLE.search(path):
+        patch_cache_control(
+            response, public=True, immutable=True,
+            max_age=settings.MEDIA_IMMUTABLE_MAX_AGE,
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_MAX_AGE
+        )
+    return response
+
+
+def media_urlpatterns():
+    """Маршрут для MEDIA_URL, если файлы раздаёт этот же сайт, а не CDN."""
+    prefix = settings.MEDIA_URL
+    if not prefix or urlsplit(prefix).netloc:
+        return []
+    return [re_path(
+        r'^%s(?P<path>.+)$' % re.escape(prefix.lstrip('/')),
+        serve_media,
+        name='media',
+    )]
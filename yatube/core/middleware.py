@@ -0,0 +1,50 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from . import timing
+
+logger = logging.getLogger('yatube.timing')
+
+
+class TimingMiddleware:
+    """Время view, SQL, рендера и обращения к кэшу для каждого запроса.
+
+    Итог уходит в заголовок Server-Timing и в timing.stats. При
+    PERFORMANCE_TIMING = False middleware исключается из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_TIMING:
+            raise MiddlewareNotUsed
+        timing.install_hooks(
+            {type(caches[alias]) for alias in settings.CACHES}
+        )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current, token = timing.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.db_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total = current.total
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        timing.stats.add(view, current, total)
+        response['Server-Timing'] = current.server_timing(total)
+        logger.debug(
+            '%s %.1fms db=%d/%.1fms tpl=%.1fms cache=%d/%d',
+            view, total * 1000, current.db_queries, current.db_time * 1000,
+            current.render_time * 1000, current.cache_hits,
+            current.cache_misses,
+        )
+        return response
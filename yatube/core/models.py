@@ -0,0 +1,57 @@
+from django.db import models
+
+
+class Task(models.Model):
+    """Отложенный вызов функции с @task (core.tasks).
+
+    Строки пишутся в той же транзакции, что и данные, которые задача
+    обрабатывает; выбирает и выполняет их команда run_tasks. Успешные
+    задачи удаляются, упавшие после всех попыток остаются со статусом
+    failed и текстом ошибки.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    arguments = models.TextField('Аргументы в JSON')
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=QUEUED,
+    )
+    run_at = models.DateTimeField('Не раньше')
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    locked_at = models.DateTimeField('Взята в работу', null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        index_together = ('status', 'run_at')
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.status})'
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому (core.storage).
+
+    references — сколько полей моделей ссылается на файл: одинаковые
+    загрузки хранятся один раз, а файл удаляется с последней ссылкой.
+    """
+    name = models.CharField('Имя', max_length=255, primary_key=True)
+    size = models.PositiveIntegerField('Размер')
+    references = models.PositiveIntegerField('Ссылок', default=1)
+    created = models.DateTimeField('Сохранён', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.references})'
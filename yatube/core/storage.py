@@ -0,0 +1,301 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Загрузка пишется во временный файл кусками и по пути хешируется
+(HashingUploadHandler), поэтому даже большой файл не попадает в память
+целиком. ContentAddressedStorage кладёт файл под именем из SHA-256
+содержимого: одинаковые картинки хранятся один раз, а StoredFile
+считает, сколько полей на файл ссылается, и delete() удаляет его
+только вместе с последней ссылкой.
+
+Куда ложатся байты, решает MEDIA_BACKEND: локальный диск
+(FileSystemStorage) или S3Storage — S3 через boto3, а без
+MEDIA_S3['ENDPOINT_URL'] локальная замена с тем же API (LocalS3Client)
+для разработки и тестов.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import Storage, get_storage_class
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from .models import StoredFile
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск и считает SHA-256 по мере поступления
+    кусков: хранилищу не нужно перечитывать файл."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.hasher.hexdigest()
+        return file
+
+
+def content_hash(content):
+    """SHA-256 содержимого; посчитанный при загрузке берётся готовым."""
+    digest = getattr(content, 'content_hash', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+    if content.seekable():
+        content.seek(0)
+    return digest
+
+
+def hashed_name(name, digest):
+    """posts/photo.JPG -> posts/ab/cd/abcd….jpg: каталог из upload_to,
+    два уровня подкаталогов, чтобы в одном не копились тысячи файлов."""
+    directory = posixpath.dirname(name)
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(
+        directory, digest[:2], digest[2:4], f'{digest}{extension}'
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    def __init__(self, backend=None):
+        self._backend = backend
+        setting_changed.connect(self._clear_cached_properties)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        if setting in ('MEDIA_BACKEND', 'MEDIA_S3'):
+            self.__dict__.pop('backend', None)
+
+    @cached_property
+    def backend(self):
+        if self._backend is not None:
+            return self._backend
+        return get_storage_class(settings.MEDIA_BACKEND)()
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        # Сначала запись в базу: она берёт блокировку, и save и delete
+        # одного файла выполняются по очереди — delete не удалит файл,
+        # на который только что появилась ссылка.
+        with transaction.atomic():
+            referenced = StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1
+            )
+            if not referenced:
+                StoredFile.objects.create(name=name, size=content.size)
+            if not self.backend.exists(name):
+                self.backend.save(name, content)
+        return name
+
+    def delete(self, name):
+        """Снимает одну ссылку; файл удаляется вместе с последней.
+
+        Файлы, сохранённые до этого хранилища, учёта не имеют и
+        удаляются сразу.
+        """
+        with transaction.atomic():
+            released = StoredFile.objects.filter(
+                name=name, references__gt=1
+            ).update(references=F('references') - 1)
+            if not released:
+                StoredFile.objects.filter(name=name).delete()
+                self.backend.delete(name)
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя значит одинаковое содержимое.
+        return name
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+class ClientError(Exception):
+    """Как botocore ClientError: код ошибки в response['Error']."""
+
+    def __init__(self, code, operation):
+        super().__init__(f'{operation}: {code}')
+        self.response = {'Error': {'Code': code}}
+
+
+class LocalS3Client:
+    """Локальная замена клиента boto3 для S3: те же методы и ответы,
+    объекты — файлы в root/<bucket>/<key>."""
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self, root):
+        self.root = root
+
+    def object_path(self, bucket, key):
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise ClientError('InvalidKey', 'Object')
+        return path
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        path = self.object_path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Как в S3, объект появляется целиком или не появляется вовсе.
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                shutil.copyfileobj(Fileobj, target)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def head_object(self, Bucket, Key):
+        path = self.object_path(Bucket, Key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ClientError('404', 'HeadObject')
+        return {
+            'ContentLength': stat.st_size,
+            'ContentType': (
+                mimetypes.guess_type(Key)[0] or 'binary/octet-stream'
+            ),
+            'LastModified': datetime.fromtimestamp(
+                stat.st_mtime, timezone.utc
+            ),
+        }
+
+    def get_object(self, Bucket, Key):
+        head = self.head_object(Bucket, Key)
+        head['Body'] = open(self.object_path(Bucket, Key), 'rb')
+        return head
+
+    def delete_object(self, Bucket, Key):
+        # S3 не считает ошибкой удаление несуществующего ключа.
+        try:
+            os.unlink(self.object_path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+
+
+@deconstructible
+class S3Storage(Storage):
+    """Объекты в бакете MEDIA_S3['BUCKET'] S3-совместимого хранилища."""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def options(self):
+        return settings.MEDIA_S3
+
+    @cached_property
+    def client(self):
+        if self._client is not None:
+            return self._client
+        if not self.options.get('ENDPOINT_URL'):
+            return LocalS3Client(settings.MEDIA_ROOT)
+        try:
+            import boto3
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для MEDIA_S3["ENDPOINT_URL"] нужен пакет boto3'
+            )
+        return boto3.client('s3', endpoint_url=self.options['ENDPOINT_URL'])
+
+    @property
+    def bucket(self):
+        return self.options['BUCKET']
+
+    def _open(self, name, mode='rb'):
+        body = self.client.get_object(Bucket=self.bucket, Key=name)['Body']
+        # Тело ответа S3 нельзя перематывать, а Pillow это нужно.
+        content = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        shutil.copyfileobj(body, content)
+        body.close()
+        content.seek(0)
+        return File(content, name)
+
+    def _save(self, name, content):
+        if content.seekable():
+            content.seek(0)
+        self.client.upload_fileobj(
+            content, self.bucket, name, ExtraArgs={
+                'ContentType': (
+                    mimetypes.guess_type(name)[0] or 'binary/octet-stream'
+                ),
+            },
+        )
+        return name
+
+    def head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=name)
+        except self.client.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+    def exists(self, name):
+        return self.head(name) is not None
+
+    def size(self, name):
+        return self.head(name)['ContentLength']
+
+    def get_modified_time(self, name):
+        return self.head(name)['LastModified']
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=name)
+
+    def get_available_name(self, name, max_length=None):
+        # S3 перезаписывает ключ, как и ContentAddressedStorage.
+        return name
+
+    def url(self, name):
+        base = self.options.get('PUBLIC_URL') or (
+            f'{settings.MEDIA_URL}{self.bucket}/'
+            if not self.options.get('ENDPOINT_URL') else
+            f'{self.options["ENDPOINT_URL"].rstrip("/")}/{self.bucket}/'
+        )
+        return base + quote(name)
@@ -0,0 +1,104 @@
+"""Очередь фоновых задач в базе.
+
+Функция, помеченная @task, ставится в очередь вызовом func.delay(...):
+аргументы (только JSON-совместимые) пишутся строкой Task в текущей
+транзакции, и view сразу отвечает. Команда run_tasks выбирает готовые
+задачи и выполняет их в пуле потоков или процессов; упавшая задача
+повторяется с растущей паузой до TASK_MAX_ATTEMPTS раз.
+
+TASKS_EAGER выполняет задачи сразу при постановке — для тестов и
+разработки без воркера.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Разрешает ставить func в очередь: func.delay(*args, **kwargs)."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    func.delay = lambda *args, **kwargs: enqueue(func, *args, **kwargs)
+    return func
+
+
+def enqueue(func, *args, **kwargs):
+    if settings.TASKS_EAGER:
+        func(*args, **kwargs)
+        return None
+    return Task.objects.create(
+        name=func.task_name,
+        arguments=json.dumps({'args': args, 'kwargs': kwargs}),
+        run_at=timezone.now(),
+    )
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, которые упали посреди
+    выполнения и не отметили результат."""
+    stale = timezone.now() - timedelta(seconds=settings.TASK_LOCK_TIMEOUT)
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=stale
+    ).update(status=Task.QUEUED, locked_at=None)
+
+
+def claim(limit):
+    """Забирает до limit готовых задач и возвращает их id.
+
+    SQLite не умеет SELECT ... FOR UPDATE SKIP LOCKED, поэтому задача
+    захватывается условным UPDATE: из нескольких воркеров строку
+    переведёт в running только один.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit]
+    claimed = []
+    for pk in candidates:
+        if Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_at=now, attempts=F('attempts') + 1,
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def execute(pk):
+    """Выполняет захваченную задачу и записывает результат."""
+    try:
+        task = Task.objects.get(pk=pk)
+        try:
+            func = import_string(task.name)
+            if not hasattr(func, 'delay'):
+                raise ImportError(f'{task.name} не помечена @task')
+            arguments = json.loads(task.arguments)
+            func(*arguments['args'], **arguments['kwargs'])
+        except Exception:
+            logger.exception('Задача %s (%s) упала', task.pk, task.name)
+            retry(task, traceback.format_exc())
+            return False
+        task.delete()
+        return True
+    finally:
+        # Поток пула живёт долго: не держим открытое соединение с БД.
+        connection.close()
+
+
+def retry(task, error):
+    if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+        task.status = Task.FAILED
+    else:
+        task.status = Task.QUEUED
+        delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        task.run_at = timezone.now() + timedelta(seconds=delay)
+    task.locked_at = None
+    task.last_error = error
+    task.save(update_fields=('status', 'run_at', 'locked_at', 'last_error'))
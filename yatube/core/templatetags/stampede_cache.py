@@ -0,0 +1,37 @@
+from django import template
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags import cache as cache_tags
+from ..cache import fetch
+
+register = template.Library()
+
+
+class StampedeCacheNode(cache_tags.CacheNode):
+    """{% cache %}, который пересчитывает фрагмент через fetch():
+    один рендер на всех при промахе и досрочно перед истечением."""
+
+    def render(self, context):
+        expire_time = self.expire_time_var.resolve(context)
+        if expire_time is not None:
+            expire_time = int(expire_time)
+        name = 'default'
+        if self.cache_name:
+            name = self.cache_name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return fetch(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            cache=caches[name],
+        )
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """Тот же синтаксис, что у {% cache %} из django.templatetags.cache."""
+    node = cache_tags.do_cache(parser, token)
+    return StampedeCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
@@ -1,5 +1,49 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache as default_cache
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
 from http import HTTPStatus
+from posts.models import Post
+from .asgi import ASGIHandler
+from .cache import DoNotCache, SQLiteCache, fetch
+from .db import (
+    PIN_COOKIE, PrimaryReplicaRouter, check_connections, retry_write,
+)
+from .media import FileRange
+from .models import Task
+from .tasks import claim, execute, requeue_stale, task
+from .timing import percentiles, stats
+
+User = get_user_model()
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task
+def explode():
+    raise ValueError('Не вышло')
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +51,562 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(PERFORMANCE_TIMING=True)
+class TimingMiddlewareTest(TestCase):
+    def setUp(self):
+        stats.clear()
+        self.staff = Client()
+        self.staff.force_login(
+            User.objects.create_user(username='admin', is_staff=True)
+        )
+
+    def test_server_timing_header(self):
+        response = Client().get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+
+    def test_stats_are_collected_per_view(self):
+        # Анонимам страница отдаётся из кэша без запросов к базе.
+        for _ in range(3):
+            self.staff.get(reverse('posts:index'))
+        response = self.staff.get(reverse('timing_stats'))
+        summary = response.json()['posts:index']
+        self.assertEqual(summary['count'], 3)
+        self.assertGreater(summary['db_queries']['p50'], 0)
+        self.assertEqual(set(summary['total_ms']), {'p50', 'p95', 'p99'})
+
+    def test_stats_hidden_from_non_staff(self):
+        response = Client().get(reverse('timing_stats'))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(PERFORMANCE_TIMING=False)
+    def test_middleware_disabled(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        response = self.staff.get(reverse('timing_stats'))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_percentiles(self):
+        values = [x / 1000 for x in range(1, 101)]
+        self.assertEqual(
+            percentiles(values), {'p50': 51, 'p95': 96, 'p99': 100}
+        )
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.caches = {
+            'file': SQLiteCache(
+                os.path.join(self.directory, 'cache.sqlite3'), {}
+            ),
+            'memory': SQLiteCache(':memory:', {}),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        for name, cache in self.caches.items():
+            with self.subTest(cache=name):
+                cache.set('key', {'value': 1})
+                self.assertEqual(cache.get('key'), {'value': 1})
+                self.assertFalse(cache.add('key', 'other'))
+                self.assertTrue(cache.add('new', 'value'))
+                self.assertEqual(
+                    cache.get_many(['key', 'new', 'missing']),
+                    {'key': {'value': 1}, 'new': 'value'},
+                )
+                cache.set('counter', 1)
+                self.assertEqual(cache.incr('counter', 5), 6)
+                with self.assertRaises(ValueError):
+                    cache.incr('missing')
+                cache.delete('key')
+                self.assertIsNone(cache.get('key'))
+                cache.clear()
+                self.assertIsNone(cache.get('new'))
+
+    def test_expired_keys(self):
+        for name, cache in self.caches.items():
+            with self.subTest(cache=name):
+                cache.set('key', 'value', 0.05)
+                cache.set('forever', 'value', None)
+                time.sleep(0.1)
+                self.assertIsNone(cache.get('key'))
+                self.assertTrue(cache.add('key', 'again'))
+                self.assertEqual(cache.get('forever'), 'value')
+
+    def test_instances_share_file(self):
+        path = os.path.join(self.directory, 'cache.sqlite3')
+        other = SQLiteCache(path, {})
+        self.caches['file'].set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_incr_is_atomic_across_threads(self):
+        for name, cache in self.caches.items():
+            with self.subTest(cache=name):
+                cache.set('counter', 0)
+
+                def work():
+                    for _ in range(100):
+                        cache.incr('counter')
+                threads = [threading.Thread(target=work) for _ in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(cache.get('counter'), 400)
+
+
+class FetchTest(TestCase):
+    def setUp(self):
+        self.cache = SQLiteCache(':memory:', {})
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+
+        def work():
+            results.append(fetch(
+                'key', self.compute(delay=0.2), 60, cache=self.cache
+            ))
+        threads = [threading.Thread(target=work) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_early_expiry(self):
+        fetch('key', self.compute('old'), 60, cache=self.cache)
+        self.assertEqual(
+            fetch('key', self.compute('new'), 60, cache=self.cache), 'old'
+        )
+        # При огромном beta любая запись считается почти истёкшей.
+        self.assertEqual(
+            fetch('key', self.compute('new'), 60, cache=self.cache,
+                  beta=1e12),
+            'new',
+        )
+
+    def test_invalid_entry_served_while_recomputed(self):
+        fetch('key', self.compute('old'), 60, cache=self.cache)
+        self.cache.add('key:lock', True, 60)
+        value = fetch(
+            'key', self.compute('new'), 60, cache=self.cache,
+            is_valid=lambda value: False,
+        )
+        self.assertEqual(value, 'old')
+        self.cache.delete('key:lock')
+        value = fetch(
+            'key', self.compute('new'), 60, cache=self.cache,
+            is_valid=lambda value: value == 'new',
+        )
+        self.assertEqual(value, 'new')
+
+    def test_do_not_cache(self):
+        def compute():
+            raise DoNotCache('error page')
+        self.assertEqual(
+            fetch('key', compute, 60, cache=self.cache), 'error page'
+        )
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.cache.get('key:lock'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TestCase):
+    databases = {'default', 'replica1'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Отдельный файл вместо зеркала default: видно, откуда прочитано.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica1'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+            'TEST': {},
+        }
+        call_command('migrate', database='replica1', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections.databases['replica1']
+        del connections._connections.replica1
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        # bulk_create не шлёт сигналов: пишем только в реплику.
+        User.objects.using('replica1').bulk_create([
+            User(pk=self.author.pk, username='author')
+        ])
+        self.primary_post = Post.objects.create(
+            author=self.author, text='С основной'
+        )
+        # Реплика отстаёт: правка поста до неё ещё не дошла.
+        Post.objects.using('replica1').bulk_create([
+            Post(pk=self.primary_post.pk, author_id=self.author.pk,
+                 text='Устаревший текст'),
+            Post(pk=self.primary_post.pk + 1, author_id=self.author.pk,
+                 text='С реплики'),
+        ])
+        # Записи выше старше REPLICA_PIN_SECONDS.
+        default_cache.clear()
+        self.client.force_login(self.author)
+
+    def test_public_pages_read_from_replica(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'С реплики')
+        self.assertNotContains(response, 'С основной')
+
+    def test_pages_read_from_primary_right_after_write(self):
+        # Кэш наполнился бы с реплики, где ещё нет новой версии данных.
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        self.assertNotContains(response, 'С реплики')
+
+    def test_session_and_user_read_from_primary(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['user'], self.author)
+
+    def test_write_pins_client_to_primary(self):
+        url = reverse('posts:post_detail', args=(self.primary_post.pk,))
+        self.assertContains(self.client.get(url), 'Устаревший текст')
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.primary_post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(url)
+        self.assertContains(response, 'С основной')
+        self.assertContains(response, 'Комментарий')
+
+    def test_writes_go_to_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertIsNone(router.db_for_read(Post))
+
+    def test_unusable_connections_are_closed(self):
+        alive, dead = mock.Mock(), mock.Mock()
+        alive.is_usable.return_value = True
+        dead.is_usable.return_value = False
+        with mock.patch('core.db.connections') as handler:
+            handler.all.return_value = [alive, dead]
+            check_connections()
+        alive.close.assert_not_called()
+        dead.close.assert_called_once()
+
+
+class SQLitePragmasTest(TestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        wrapper = DatabaseWrapper({
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(tmp, 'tuned.sqlite3'),
+        }, alias='tuned')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL.
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+@override_settings(WRITE_RETRY_ATTEMPTS=3, WRITE_RETRY_DELAY=0)
+class RetryWriteTest(TransactionTestCase):
+    def test_retries_while_locked(self):
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'saved',
+        ])
+        self.assertEqual(retry_write(write), 'saved')
+        self.assertEqual(write.call_count, 2)
+
+    def test_gives_up_after_attempts(self):
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_write(write)
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_are_not_retried(self):
+        write = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_write(write)
+        self.assertEqual(write.call_count, 1)
+
+
+@override_settings(TASK_MAX_ATTEMPTS=2, TASK_RETRY_DELAY=60)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        remember.delay(1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_task_is_claimed_once(self):
+        queued = remember.delay(1)
+        self.assertEqual(claim(10), [queued.pk])
+        self.assertEqual(claim(10), [])
+
+    def test_failed_task_is_retried_then_failed(self):
+        queued = explode.delay()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(execute(claim(1)[0]))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('Не вышло', queued.last_error)
+        # Пауза перед повтором не прошла.
+        self.assertEqual(claim(1), [])
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            execute(claim(1)[0])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_only_registered_functions_run(self):
+        Task.objects.create(
+            name='os.remove', arguments='{"args": ["x"], "kwargs": {}}',
+            run_at=timezone.now(),
+        )
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(execute(claim(1)[0]))
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_stale_tasks_are_requeued(self):
+        queued = remember.delay(1)
+        claim(1)
+        self.assertEqual(requeue_stale(), 0)
+        Task.objects.update(locked_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim(1), [queued.pk])
+
+
+class RunTasksCommandTest(TransactionTestCase):
+    # Воркер выполняет задачи в своих потоках: они должны видеть данные,
+    # поэтому без транзакции TestCase.
+    def test_delay_queues_and_worker_runs(self):
+        calls.clear()
+        remember.delay('значение')
+        self.assertEqual(calls, [])
+        call_command('run_tasks', '--burst', stdout=io.StringIO())
+        self.assertEqual(calls, ['значение'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_password_reset_email_is_queued(self):
+        User.objects.create_user(
+            username='user', email='user@example.com', password='secret',
+        )
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'user@example.com'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(mail.outbox, [])
+        self.assertTrue(Task.objects.filter(
+            name='users.tasks.send_email'
+        ).exists())
+        call_command('run_tasks', '--burst', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    # View выполняются в потоках пула: без транзакции TestCase.
+    def setUp(self):
+        default_cache.clear()
+        self.handler = ASGIHandler(threads=2)
+        self.addCleanup(self.handler.executor.shutdown)
+
+    def call(self, scope, messages):
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        return sent
+
+    def get(self, path, query=b''):
+        sent = self.call({
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query,
+            'headers': [(b'host', b'testserver')],
+        }, [{'type': 'http.request', 'body': b''}])
+        start, body = sent
+        return start['status'], dict(start['headers']), body['body']
+
+    def test_pages_are_served(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост через ASGI')
+        status, headers, body = self.get('/')
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertIn('Пост через ASGI', body.decode())
+        self.assertTrue(headers[b'content-type'].startswith(b'text/html'))
+        status, _, body = self.get(
+            '/search/', 'q=%D0%BF%D0%BE%D1%81%D1%82'.encode()
+        )
+        self.assertIn('Пост через ASGI', body.decode())
+        status, _, _ = self.get('/nonexist-page/')
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+
+    def test_client_gone_before_body(self):
+        sent = self.call(
+            {'type': 'http', 'method': 'POST', 'path': '/', 'headers': []},
+            [{'type': 'http.disconnect'}],
+        )
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        sent = self.call({'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ])
+        self.assertEqual([message['type'] for message in sent], [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete',
+        ])
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+HASHED = 'posts/ab/cd/abcd' + '0' * 60 + '.txt'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_ACCEL=None)
+class MediaServingTest(TestCase):
+    content = b'0123456789'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (HASHED, 'plain.txt'):
+            path = os.path.join(MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name, **headers):
+        response = self.client.get(f'/media/{name}', **headers)
+        body = (
+            b''.join(response.streaming_content) if response.streaming
+            else response.content
+        )
+        response.close()
+        return response, body
+
+    def test_file_is_streamed_with_cache_headers(self):
+        response, body = self.get(HASHED)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        response, _ = self.get('plain.txt')
+        self.assertEqual(
+            response['Cache-Control'], 'public, max-age=3600'
+        )
+
+    def test_not_modified(self):
+        response, _ = self.get(HASHED)
+        response, body = self.get(
+            HASHED, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(body, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_ranges(self):
+        cases = (
+            ('bytes=2-5', HTTPStatus.PARTIAL_CONTENT, b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', HTTPStatus.PARTIAL_CONTENT, b'789', 'bytes 7-9/10'),
+            ('bytes=-3', HTTPStatus.PARTIAL_CONTENT, b'789', 'bytes 7-9/10'),
+            ('bytes=5-100', HTTPStatus.PARTIAL_CONTENT, b'56789',
+             'bytes 5-9/10'),
+            ('bytes=10-', HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, b'',
+             'bytes */10'),
+            ('bytes=0-1,4-5', HTTPStatus.OK, self.content, None),
+        )
+        for header, status, content, content_range in cases:
+            with self.subTest(header=header):
+                response, body = self.get('plain.txt', HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(body, content)
+                self.assertEqual(response.get('Content-Range'), content_range)
+                if status == HTTPStatus.PARTIAL_CONTENT:
+                    self.assertEqual(
+                        response['Content-Length'], str(len(content))
+                    )
+        response, body = self.get(
+            'plain.txt', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(body, self.content)
+
+    def test_file_range_keeps_fileno(self):
+        with open(os.path.join(MEDIA_ROOT, 'plain.txt'), 'rb') as file:
+            file.seek(4)
+            part = FileRange(file, 3)
+            self.assertEqual(part.fileno(), file.fileno())
+            self.assertEqual(part.read(2), b'45')
+            self.assertEqual(part.read(), b'6')
+            self.assertEqual(part.read(), b'')
+
+    def test_missing_and_unsafe_paths(self):
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        for name in ('missing.txt', 'posts/', '../etc/passwd', 'plain.txt/x'):
+            with self.subTest(name=name):
+                response, _ = self.get(name)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.post(f'/media/{HASHED}')
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+    def test_proxy_sends_the_file(self):
+        with self.settings(MEDIA_ACCEL='x-accel-redirect'):
+            response, body = self.get(HASHED)
+        self.assertEqual(body, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/internal-media/{HASHED}'
+        )
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertIn('immutable', response['Cache-Control'])
+        with self.settings(MEDIA_ACCEL='x-sendfile'):
+            response, _ = self.get('plain.txt')
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(MEDIA_ROOT, 'plain.txt')
+        )
@@ -0,0 +1,151 @@
+"""Сбор времени запросов: БД, шаблоны, кэш, всего.
+
+Счётчики текущего запроса живут в contextvar, агрегаты по view — в
+памяти процесса (последние PERFORMANCE_TIMING_WINDOW запросов на view).
+"""
+import threading
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+
+_current = ContextVar('timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def total(self):
+        return perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} q"',
+            f'tpl;dur={self.render_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hit {self.cache_misses} miss"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+def start():
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """execute_wrapper для connection: время и число SQL-запросов."""
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db_time += perf_counter() - started
+        timing.db_queries += 1
+
+
+_patched = False
+_patch_lock = threading.Lock()
+
+
+def install_hooks(cache_classes):
+    """Оборачивает рендер шаблонов и get() кэшей. Выполняется один раз
+    и только при включённом сборе."""
+    global _patched
+    with _patch_lock:
+        if _patched:
+            return
+        from django.template.backends.django import Template
+        Template.render = _timed_render(Template.render)
+        for cls in cache_classes:
+            cls.get = _counted_get(cls.get)
+        _patched = True
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        timing = _current.get()
+        if timing is None:
+            return render(self, *args, **kwargs)
+        started = perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timing.render_time += perf_counter() - started
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, default, version)
+        timing = _current.get()
+        if timing is not None:
+            if value is default:
+                timing.cache_misses += 1
+            else:
+                timing.cache_hits += 1
+        return value
+    return wrapper
+
+
+class Stats:
+    """Скользящее окно длительностей по каждому view."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(
+            lambda: deque(maxlen=settings.PERFORMANCE_TIMING_WINDOW)
+        )
+
+    def add(self, view, timing, total):
+        with self.lock:
+            self.samples[view].append((
+                total, timing.db_time, timing.db_queries, timing.render_time,
+            ))
+
+    def summary(self):
+        with self.lock:
+            samples = {view: list(rows) for view, rows in self.samples.items()}
+        return {
+            view: {
+                'count': len(rows),
+                'total_ms': percentiles([row[0] for row in rows]),
+                'db_ms': percentiles([row[1] for row in rows]),
+                'db_queries': percentiles([row[2] for row in rows], 1),
+                'render_ms': percentiles([row[3] for row in rows]),
+            }
+            for view, rows in sorted(samples.items())
+        }
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+def percentiles(values, scale=1000):
+    values = sorted(values)
+    result = {}
+    for name, share in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+        index = min(len(values) - 1, int(len(values) * share))
+        result[name] = round(values[index] * scale, 2)
+    return result
+
+
+stats = Stats()
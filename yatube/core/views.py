@@ -1,5 +1,8 @@
 # core/views.py
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
+from .timing import stats
 
 
 def page_not_found(request, exception):
@@ -8,3 +11,9 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def timing_stats(request):
+    if not (settings.PERFORMANCE_TIMING and request.user.is_staff):
+        raise Http404
+    return JsonResponse(stats.summary())
@@ -0,0 +1,225 @@
+"""JSON API для чтения: ленты, посты, комментарии, группы, профили.
+
+Строки читаются через values(), без экземпляров моделей, а ?fields=
+сужает и ответ, и SELECT. Ленты листаются курсорами, как HTML-страницы:
+?cursor= из next_cursor или previous_cursor, ?limit= — размер страницы.
+Ответы компактные, с ETag из версий feed_cache и сжимаются gzip, если
+клиент его принимает.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+from core.db import reads_from_replica
+from .conditional import conditional_page
+from .models import Comment, Group, Post, User
+from .paginator import CursorPaginator
+from .timeline import timeline_posts
+
+# Имя в ответе -> путь для values(). id и дата нужны курсору и читаются
+# всегда.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'pk',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'id': 'pk',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'counter__posts_count',
+    'followers_count': 'counter__followers_count',
+    'following_count': 'counter__following_count',
+}
+
+CONVERTERS = {
+    'image': lambda name: default_storage.url(name) if name else None,
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def api_view(name=None, follow=False, post=False):
+    """JSON-ответ из словаря, который вернул view, со сжатием gzip.
+
+    name — ключ CACHE_CONTROL для условного GET; без него ответ не
+    кэшируется: его данные не отражены в версиях feed_cache. ApiError
+    превращается в {"error": ...} с его статусом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            status = 200
+            try:
+                data = view(request, *args, **kwargs)
+            except ApiError as error:
+                data, status = {'error': error.message}, error.status
+            return JsonResponse(data, status=status, json_dumps_params={
+                'ensure_ascii': False, 'separators': (',', ':'),
+            })
+        wrapper = reads_from_replica(wrapper)
+        if name is not None:
+            wrapper = conditional_page(name, follow, post)(wrapper)
+        return gzip_page(require_safe(wrapper))
+    return decorator
+
+
+def selected_fields(request, available):
+    """Поля из ?fields=a,b; без параметра — все."""
+    names = request.GET.get('fields')
+    if not names:
+        return list(available)
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return names
+
+
+def rows(queryset, fields, names, extra=()):
+    """values() только нужных столбцов; extra — служебные, например
+    ключ курсора."""
+    paths = {fields[name] for name in names} | set(extra)
+    # prefetch_related из for_feed() со словарями не работает.
+    return queryset.prefetch_related(None).values(*paths)
+
+
+def render_row(row, fields, names):
+    result = {}
+    for name in names:
+        value = row[fields[name]]
+        if name in CONVERTERS:
+            value = CONVERTERS[name](value)
+        result[name] = value
+    return result
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(
+            f'limit должен быть от 1 до {settings.API_MAX_PAGE_SIZE}'
+        )
+    return limit
+
+
+def cursor_page(request, queryset, fields, date_field, ascending=False):
+    names = selected_fields(request, fields)
+    paginator = CursorPaginator(
+        rows(queryset, fields, names, extra=('pk', date_field)),
+        page_size(request), date_field, ascending=ascending,
+    )
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    return {
+        'results': [render_row(row, fields, names) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def get_row(queryset, fields, names, **lookup):
+    row = rows(queryset, fields, names).filter(**lookup).first()
+    if row is None:
+        raise ApiError('Не найдено', status=404)
+    return render_row(row, fields, names)
+
+
+def exists(model, **lookup):
+    if not model.objects.filter(**lookup).exists():
+        raise ApiError('Не найдено', status=404)
+
+
+@api_view('api_posts')
+def posts(request):
+    return cursor_page(request, Post.objects.all(), POST_FIELDS, 'pub_date')
+
+
+@api_view('api_post', post=True)
+def post(request, post_id):
+    names = selected_fields(request, POST_FIELDS)
+    return get_row(Post.objects.all(), POST_FIELDS, names, pk=post_id)
+
+
+@api_view('api_post', post=True)
+def post_comments(request, post_id):
+    exists(Post, pk=post_id)
+    return cursor_page(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        'created', ascending=True,
+    )
+
+
+# Правка группы не меняет версию лент: без условного GET.
+@api_view()
+def groups(request):
+    names = selected_fields(request, GROUP_FIELDS)
+    return {'results': [
+        render_row(row, GROUP_FIELDS, names)
+        for row in rows(
+            Group.objects.order_by('slug'), GROUP_FIELDS, names
+        )
+    ]}
+
+
+@api_view('api_posts')
+def group_posts(request, slug):
+    exists(Group, slug=slug)
+    return cursor_page(
+        request, Post.objects.filter(group__slug=slug), POST_FIELDS,
+        'pub_date',
+    )
+
+
+# Счётчики подписчиков не меняют версию лент: без условного GET.
+@api_view()
+def profile(request, username):
+    names = selected_fields(request, PROFILE_FIELDS)
+    return get_row(
+        User.objects.all(), PROFILE_FIELDS, names, username=username
+    )
+
+
+@api_view('api_posts')
+def profile_posts(request, username):
+    exists(User, username=username)
+    return cursor_page(
+        request, Post.objects.filter(author__username=username),
+        POST_FIELDS, 'pub_date',
+    )
+
+
+@api_view('api_follow', follow=True)
+def follow(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', status=401)
+    queryset, date_field = timeline_posts(request.user)
+    return cursor_page(request, queryset, POST_FIELDS, date_field)
@@ -0,0 +1,145 @@
+import json
+import platform
+import subprocess
+from contextlib import contextmanager
+from timeit import default_timer
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from core.timing import percentiles
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Транзакция, которая всегда откатывается: данные бенчмарка не
+    остаются в базе."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def timed(call, repeat):
+    """Среднее время одного вызова в миллисекундах после прогрева."""
+    call()
+    started = default_timer()
+    for _ in range(repeat):
+        call()
+    return (default_timer() - started) / repeat * 1000
+
+
+class QueryCounter:
+    """Считает SQL-запросы через execute_wrapper. CaptureQueriesContext
+    не годится для тестового клиента: request_started чистит лог."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def summarize(samples):
+    """Среднее и перцентили для списка времён в миллисекундах."""
+    summary = {'mean_ms': round(sum(samples) / len(samples), 2)}
+    summary.update({
+        f'{name}_ms': value
+        for name, value in percentiles(samples, scale=1).items()
+    })
+    return summary
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, kind, results, **meta):
+    """JSON-отчёт с метаданными запуска: по нему сравниваются коммиты."""
+    report = {
+        'kind': kind,
+        'revision': revision(),
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        **meta,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(report, stream, ensure_ascii=False, indent=2)
+    return report
+
+
+def regressions(results, baseline_path, threshold, metric='p50_ms'):
+    """Случаи, где metric вырос больше чем в threshold раз."""
+    with open(baseline_path, encoding='utf-8') as stream:
+        baseline = json.load(stream)['results']
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name, {}).get(metric)
+        if before and result[metric] > before * threshold:
+            found.append((name, before, result[metric]))
+    return found
+
+
+def view_targets():
+    """Адреса лент на самых «тяжёлых» объектах базы: крупнейшая группа,
+    автор с наибольшим числом подписчиков, самый обсуждаемый пост.
+    Для follow_index — пользователь с наибольшим числом подписок."""
+    from .models import Group, Post, UserCounter
+
+    targets = {'index': (reverse('posts:index'), None)}
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    if group:
+        targets['group_posts'] = (
+            reverse('posts:group_list', kwargs={'slug': group.slug}), None
+        )
+    counter = UserCounter.objects.select_related('user').order_by(
+        '-followers_count'
+    ).first()
+    if counter:
+        targets['profile'] = (
+            reverse('posts:profile', kwargs={'username': counter.user}),
+            None,
+        )
+    post = Post.objects.order_by('-comments_count').first()
+    if post:
+        targets['post_detail'] = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}), None
+        )
+    reader = UserCounter.objects.select_related('user').order_by(
+        '-following_count'
+    ).first()
+    if reader:
+        targets['follow_index'] = (reverse('posts:follow_index'), reader.user)
+    return targets
+
+
+def session_cookie(user):
+    """Заголовок Cookie с сессией user для лент, закрытых логином."""
+    if user is None:
+        return None
+    client = Client()
+    client.force_login(user)
+    name = settings.SESSION_COOKIE_NAME
+    return f'{name}={client.cookies[name].value}'
@@ -0,0 +1,68 @@
+"""Условный GET для лент и страницы поста.
+
+Валидаторы строятся из версий feed_cache без запросов к базе: версии
+меняются сигналами при записи постов, комментариев, подписок, групп и
+пользователей. Страница поста зависит ещё от тегов его автора и группы;
+они тоже берутся из кэша, и только при промахе нужен запрос. При
+совпавшем If-None-Match или If-Modified-Since view и шаблоны не
+запускаются, клиент получает 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .feed_cache import page_state
+
+
+def conditional_page(name, follow=False, post=False, tags=()):
+    """ETag, Last-Modified и Cache-Control из settings.CACHE_CONTROL[name].
+
+    follow — страница зависит от подписок читателя, post — от
+    комментариев, автора и группы поста из kwargs['post_id'], tags — от
+    тегов feed_cache с полями из kwargs, как у anonymous_page_cache.
+    """
+    def state(request, kwargs):
+        if not hasattr(request, '_page_state'):
+            request._page_state = page_state(
+                request,
+                follow=follow,
+                post_id=kwargs['post_id'] if post else None,
+                tags=[tag.format(**kwargs) for tag in tags],
+            )
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        versions, _ = state(request, kwargs)
+        # Шапка и формы зависят от пользователя, страница — от адреса.
+        # Вход меняет ключ сессии вместе с секретом CSRF: иначе страница
+        # с формой из прошлой сессии ушла бы со старым
+        # csrfmiddlewaretoken. Саму куку CSRF не берём: её ставит первый
+        # ответ с формой, и ETag сменился бы без причины.
+        raw = '|'.join(str(part) for part in (
+            request.path, request.GET.urlencode(), request.user.pk,
+            request.session.session_key, *versions,
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # По одному If-Modified-Since не отличить прошлую сессию.
+        if request.user.is_authenticated:
+            return None
+        return state(request, kwargs)[1]
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            else:
+                patch_cache_control(response, public=True)
+            patch_cache_control(response, **settings.CACHE_CONTROL[name])
+            return response
+        return wrapper
+    return decorator
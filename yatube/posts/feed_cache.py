@@ -0,0 +1,130 @@
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from django.core.cache import cache
+from core.db import note_write
+from yatube.settings import FEED_CACHE_TIMEOUT
+from .models import Post
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FOLLOW_VERSION_KEY = 'posts:follow_version:{}'
+POST_VERSION_KEY = 'posts:post_version:{}'
+TAG_VERSION_KEY = 'posts:tag:{}'
+POST_TAGS_KEY = 'posts:post_tags:{}'
+# Рядом с версией хранится время её смены: из него Last-Modified.
+CHANGED_KEY = '{}:changed'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Начинаем с текущего времени, а не с 1: если ключ вытеснят,
+        # новая версия не совпадёт ни с одной из старых.
+        cache.add(key, int(time.time() * 1000), None)
+        cache.add(CHANGED_KEY.format(key), time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        _version(key)
+    cache.set(CHANGED_KEY.format(key), time.time(), None)
+    note_write()
+
+
+def bump_feed_version():
+    """Сбрасывает закэшированные страницы всех лент."""
+    _bump(FEED_VERSION_KEY)
+
+
+def bump_follow_version(user_id):
+    """Сбрасывает ленту подписок одного пользователя."""
+    _bump(FOLLOW_VERSION_KEY.format(user_id))
+
+
+def bump_post_version(post_id):
+    """Сбрасывает валидаторы страницы поста (комментарии, миниатюры)."""
+    _bump(POST_VERSION_KEY.format(post_id))
+
+
+def _tag_key(tag):
+    # slug и имя пользователя бывают с пробелами и кириллицей, а
+    # memcached принимает в ключах только ASCII без пробелов.
+    return TAG_VERSION_KEY.format(quote(tag, safe=':'))
+
+
+def tag_versions(tags):
+    """{тег: версия} для тегов кэша страниц (posts/page_cache.py)."""
+    return {tag: _version(_tag_key(tag)) for tag in tags}
+
+
+def bump_tags(*tags):
+    """Сбрасывает все закэшированные страницы с любым из тегов."""
+    for tag in tags:
+        _bump(_tag_key(tag))
+
+
+def post_tags(post_id):
+    """Теги автора и группы поста: от них зависит его страница.
+
+    Берутся из кэша, при промахе — одним запросом по первичному ключу.
+    """
+    key = POST_TAGS_KEY.format(post_id)
+    tags = cache.get(key)
+    if tags is None:
+        tags = []
+        row = Post.objects.filter(pk=post_id).values_list(
+            'author_id', 'group_id'
+        ).first()
+        if row is not None:
+            author_id, group_id = row
+            tags.append(f'author:{author_id}')
+            if group_id is not None:
+                tags.append(f'group:{group_id}')
+        cache.set(key, tags, FEED_CACHE_TIMEOUT)
+    return tags
+
+
+def forget_post_tags(post_id):
+    """Автор или группа поста могли смениться."""
+    cache.delete(POST_TAGS_KEY.format(post_id))
+
+
+def page_state(request, follow=False, post_id=None, tags=()):
+    """Версии данных страницы и время их последнего изменения.
+
+    Время None, если его вытеснили из кэша: тогда обходимся без
+    Last-Modified.
+    """
+    keys = [FEED_VERSION_KEY]
+    if follow and request.user.is_authenticated:
+        keys.append(FOLLOW_VERSION_KEY.format(request.user.id))
+    if post_id is not None:
+        keys.append(POST_VERSION_KEY.format(post_id))
+        tags = [*tags, *post_tags(post_id)]
+    keys.extend(_tag_key(tag) for tag in tags)
+    versions = [_version(key) for key in keys]
+    changed = cache.get_many([CHANGED_KEY.format(key) for key in keys])
+    last_modified = None
+    if len(changed) == len(keys):
+        last_modified = datetime.fromtimestamp(
+            max(changed.values()), timezone.utc
+        )
+    return versions, last_modified
+
+
+def feed_cache_context(request, feed, *parts):
+    """Ключ фрагмента для {% cache %}: лента, страница и версия."""
+    page = request.GET.get('cursor') or request.GET.get('page') or ''
+    versions = [_version(FEED_VERSION_KEY)]
+    if feed == 'follow':
+        versions.append(_version(FOLLOW_VERSION_KEY.format(request.user.id)))
+    key = ':'.join(str(part) for part in (feed, *parts, page, *versions))
+    return {
+        'feed_cache_key': key,
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь задач построение недостающих миниатюр для '
+            'уже загруженных картинок; строит их run_tasks.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('image').order_by('pk')
+        scheduled = 0
+        for post in posts.iterator():
+            if thumbnails.is_stale(post):
+                thumbnails.schedule(post.pk)
+                scheduled += 1
+        self.stdout.write(f'Поставлено в очередь постов: {scheduled}')
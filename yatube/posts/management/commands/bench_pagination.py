@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from posts.benchmarks import rolled_back, timed
+from posts.models import Post
+from posts.paginator import CursorPaginator, NEXT, encode_cursor
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку OFFSET- и keyset-пагинации '
+            'на первой и глубокой странице. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        deep_page = options['page']
+        total = deep_page * POSTS_PER_PAGE
+        author = User.objects.create_user(username='bench_pagination')
+        self.stdout.write(f'Создаём {total} постов...')
+        for start in range(0, total, options['batch']):
+            size = min(options['batch'], total - start)
+            Post.objects.bulk_create(
+                Post(text=f'Пост {start + i}', author=author)
+                for i in range(size)
+            )
+        posts = Post.objects.filter(author=author)
+        pub_date, pk = posts.order_by('-pub_date', '-pk').values_list(
+            'pub_date', 'pk'
+        )[(deep_page - 1) * POSTS_PER_PAGE - 1]
+        deep_cursor = encode_cursor(NEXT, pub_date, pk)
+
+        def offset(number):
+            # Новый Paginator на каждый вызов, как во view: COUNT(*) входит
+            # в стоимость страницы.
+            paginator = Paginator(
+                posts.order_by('-pub_date', '-pk'), POSTS_PER_PAGE
+            )
+            return list(paginator.get_page(number))
+
+        def cursor(token):
+            paginator = CursorPaginator(posts, POSTS_PER_PAGE)
+            return list(paginator.get_cursor_page(token))
+
+        cases = (
+            ('offset', 1, lambda: offset(1)),
+            ('offset', deep_page, lambda: offset(deep_page)),
+            ('cursor', 1, lambda: cursor(None)),
+            ('cursor', deep_page, lambda: cursor(deep_cursor)),
+        )
+        self.stdout.write(f'{"режим":<8}{"страница":>10}{"мс":>10}')
+        for mode, page, call in cases:
+            elapsed = timed(call, options['repeat'])
+            self.stdout.write(f'{mode:<8}{page:>10}{elapsed:>10.2f}')
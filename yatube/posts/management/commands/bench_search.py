@@ -0,0 +1,53 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from posts.benchmarks import rolled_back, timed
+from posts.models import Post
+from posts.search import SimpleBackend, SqliteFTS5Backend
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+WORDS = [f'слово{i}' for i in range(5000)]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку поиска через FTS5 и LIKE при разном '
+            'размере корпуса. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+        )
+        parser.add_argument('--words', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"постов":>10}{"fts5, мс":>12}{"like, мс":>12}')
+        random.seed(0)
+        for size in options['sizes']:
+            with rolled_back():
+                fts, like = self.run(size, options)
+            self.stdout.write(f'{size:>10}{fts:>12.2f}{like:>12.2f}')
+
+    def run(self, size, options):
+        author = User.objects.create_user(username='bench_search')
+        for start in range(0, size, 5000):
+            Post.objects.bulk_create(
+                Post(
+                    text=' '.join(random.choices(WORDS, k=options['words'])),
+                    author=author,
+                )
+                for _ in range(min(5000, size - start))
+            )
+        fts = SqliteFTS5Backend()
+        fts.rebuild()
+        query = f'{WORDS[1]} {WORDS[2]}'
+        results = []
+        for backend in (fts, SimpleBackend()):
+            def first_page():
+                backend.count(query)
+                return backend.ids(query, 0, POSTS_PER_PAGE)
+            results.append(timed(first_page, options['repeat']))
+        return results
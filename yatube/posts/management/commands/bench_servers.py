@@ -0,0 +1,264 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from timeit import default_timer
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from core.asgi import ASGIHandler
+from posts.benchmarks import (session_cookie, summarize, view_targets,
+                              write_report)
+from yatube.settings import ASGI_THREADS
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с фиксированным пулом потоков, как у gunicorn
+    --threads: поток занят запросом от первого байта до последнего."""
+    request_queue_size = 1024
+
+    def __init__(self, address, threads):
+        super().__init__(address, QuietHandler)
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_in_thread, request, client_address)
+
+    def process_in_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class ASGIServer:
+    """Минимальный HTTP/1.1-сервер для ASGI-приложения: один запрос на
+    соединение. Только для сравнения, не для продакшена."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        future = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, '127.0.0.1', 0, backlog=1024),
+            self.loop,
+        )
+        self.server = future.result()
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        request_line, *lines = head.decode('latin-1').split('\r\n')
+        method, target, version = request_line.split(' ')
+        headers = [
+            (name.strip().lower().encode('latin-1'),
+             value.strip().encode('latin-1'))
+            for name, value in (
+                line.split(':', 1) for line in lines if ':' in line
+            )
+        ]
+        length = int(dict(headers).get(b'content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': version.split('/')[1],
+            'method': method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'server': writer.get_extra_info('sockname')[:2],
+            'client': writer.get_extra_info('peername')[:2],
+        }
+        messages = [{'type': 'http.request', 'body': body}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status = HTTPStatus(message['status'])
+                writer.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'.encode()
+                )
+                for name, value in message['headers']:
+                    writer.write(name + b': ' + value + b'\r\n')
+                writer.write(b'Connection: close\r\n\r\n')
+            else:
+                writer.write(message.get('body', b''))
+            await writer.drain()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            writer.close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает WSGI и ASGI (yatube/asgi.py) на одинаковом пуле '
+            'потоков: задержки и пропускная способность лент при росте '
+            'числа одновременных медленных клиентов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', default='1,8,32,64',
+            help='Уровни числа одновременных клиентов через запятую.',
+        )
+        parser.add_argument('--threads', type=int, default=ASGI_THREADS)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждый уровень.',
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=0.2,
+            help='За сколько секунд клиент досылает запрос: медленная '
+                 'сеть, которая держит поток WSGI-сервера.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Путь для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        targets = [
+            (name, url, session_cookie(user))
+            for name, (url, user) in view_targets().items()
+        ]
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        results = {}
+        self.stdout.write(
+            f'{"server":<8}{"clients":>8}{"rps":>9}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}{"errors":>8}'
+        )
+        for kind in ('wsgi', 'asgi'):
+            port, stop = self.serve(kind, options['threads'])
+            try:
+                for level in levels:
+                    result = self.run(port, targets, level, options)
+                    results[f'{kind}_{level}'] = result
+                    self.stdout.write(
+                        f'{kind:<8}{level:>8}{result["rps"]:>9.1f}'
+                        f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                        f'{result["p99_ms"]:>10.2f}{result["errors"]:>8}'
+                    )
+            finally:
+                stop()
+        if options['output']:
+            write_report(
+                options['output'], 'servers', results,
+                threads=options['threads'], duration=options['duration'],
+                client_delay=options['client_delay'],
+            )
+
+    def serve(self, kind, threads):
+        if kind == 'wsgi':
+            server = PooledWSGIServer(('127.0.0.1', 0), threads)
+            server.set_app(WSGIHandler())
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+
+            def stop():
+                server.shutdown()
+                server.server_close()
+                thread.join()
+            return server.server_port, stop
+        handler = ASGIHandler(threads)
+        server = ASGIServer(handler)
+        port = server.start()
+
+        def stop():
+            server.stop()
+            handler.executor.shutdown(wait=True)
+        return port, stop
+
+    def run(self, port, targets, level, options):
+        samples = defaultdict(list)
+        statuses = Counter()
+        lock = threading.Lock()
+        deadline = default_timer() + options['duration']
+
+        def client(seed):
+            chooser = random.Random(seed)
+            while default_timer() < deadline:
+                name, url, cookie = chooser.choice(targets)
+                started = default_timer()
+                status = self.fetch(port, url, cookie, options)
+                elapsed = (default_timer() - started) * 1000
+                with lock:
+                    samples[name].append(elapsed)
+                    statuses[status] += 1
+
+        started = default_timer()
+        clients = [
+            threading.Thread(target=client, args=(options['seed'] + number,))
+            for number in range(level)
+        ]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = default_timer() - started
+        values = [value for rows in samples.values() for value in rows]
+        if not values:
+            raise CommandError('Ни один запрос не выполнен.')
+        result = summarize(values)
+        result['rps'] = round(len(values) / elapsed, 2)
+        result['errors'] = sum(
+            count for status, count in statuses.items() if status != 200
+        )
+        return result
+
+    def fetch(self, port, url, cookie, options):
+        """GET, который клиент досылает по частям за --client-delay."""
+        head = f'GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+        if cookie:
+            head += f'Cookie: {cookie}\r\n'
+        head = (head + 'Connection: close\r\n\r\n').encode()
+        parts = 4
+        size = len(head) // parts + 1
+        try:
+            with socket.create_connection(('127.0.0.1', port), 30) as conn:
+                for start in range(0, len(head), size):
+                    conn.sendall(head[start:start + size])
+                    if start + size < len(head):
+                        time.sleep(options['client_delay'] / (parts - 1))
+                response = bytearray()
+                while True:
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        break
+                    response += chunk
+            return int(response.split(b' ', 2)[1])
+        except (OSError, IndexError, ValueError):
+            return 'error'
@@ -0,0 +1,105 @@
+from itertools import cycle, islice
+from timeit import default_timer
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template import Engine, RequestContext, engines
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from posts.benchmarks import summarize, write_report
+from posts.models import Post
+
+# Фрагментный кэш ленты подменил бы рендер постов чтением из кэша.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Микробенчмарк шаблонов: рендер posts/index.html на 10 и 100 '
+            'постов с кэширующими загрузчиками и без, без базы и кэша. '
+            'Разница между размерами страниц — цена одного поста.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,100',
+            help='Числа постов на странице через запятую.',
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Путь для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        sizes = sorted({int(size) for size in options['sizes'].split(',')})
+        if len(sizes) < 2:
+            raise CommandError('Нужны хотя бы два размера страницы.')
+        posts = list(Post.objects.for_feed()[:sizes[-1]])
+        if not posts:
+            raise CommandError('Нет постов: сначала generate_data.')
+        posts = list(islice(cycle(posts), sizes[-1]))
+        request = RequestFactory().get(reverse('posts:index'))
+        request.user = AnonymousUser()
+        results = {}
+        self.stdout.write(
+            f'{"loaders":<10}{"posts":>7}{"p50, мс":>10}{"p95, мс":>10}'
+        )
+        with override_settings(CACHES=NO_CACHE):
+            for mode in ('cached', 'uncached'):
+                engine = self.engine(cached=mode == 'cached')
+                for size in sizes:
+                    page = Paginator(posts[:size], size).page(1)
+                    result = self.run(engine, request, page, options)
+                    results[f'{mode}_{size}'] = result
+                    self.stdout.write(
+                        f'{mode:<10}{size:>7}{result["p50_ms"]:>10.2f}'
+                        f'{result["p95_ms"]:>10.2f}'
+                    )
+                small = results[f'{mode}_{sizes[0]}']['p50_ms']
+                large = results[f'{mode}_{sizes[-1]}']['p50_ms']
+                per_post = (large - small) / (sizes[-1] - sizes[0])
+                results[f'{mode}_per_post'] = {
+                    'post_us': round(per_post * 1000, 1),
+                    'page_ms': round(small - per_post * sizes[0], 2),
+                }
+                self.stdout.write(
+                    f'{mode}: пост {per_post * 1000:.1f} мкс, страница '
+                    f'без постов {small - per_post * sizes[0]:.2f} мс'
+                )
+        if options['output']:
+            write_report(
+                options['output'], 'templates', results,
+                repeat=options['repeat'], sizes=sizes,
+            )
+
+    def engine(self, cached):
+        """Копия движка из настроек с загрузчиками с кэшем или без."""
+        base = engines['django'].engine
+        loaders = settings.TEMPLATE_LOADERS
+        if cached:
+            loaders = [('django.template.loaders.cached.Loader', loaders)]
+        return Engine(
+            dirs=base.dirs,
+            context_processors=base.context_processors,
+            loaders=loaders,
+            libraries=base.libraries,
+        )
+
+    def run(self, engine, request, page, options):
+        context = {
+            'page_obj': page,
+            'feed_cache_timeout': 0,
+            'feed_cache_key': 'bench',
+        }
+
+        def render():
+            template = engine.get_template('posts/index.html')
+            return template.render(RequestContext(request, context))
+
+        render()
+        samples = []
+        for _ in range(options['repeat']):
+            started = default_timer()
+            render()
+            samples.append((default_timer() - started) * 1000)
+        return summarize(samples)
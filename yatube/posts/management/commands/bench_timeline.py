@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from posts.benchmarks import rolled_back, timed
+from posts.models import Follow, Post
+from posts.paginator import CursorPaginator
+from posts.timeline import backfill, timeline_posts
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку первой страницы ленты подписок в режимах '
+            'pull и push при разном числе подписок. Данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows', type=int, nargs='+', default=[10, 100, 1000]
+        )
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"подписок":>10}{"pull, мс":>12}{"push, мс":>12}')
+        for follows in options['follows']:
+            with rolled_back():
+                pull, push = self.run(follows, options)
+            self.stdout.write(f'{follows:>10}{pull:>12.2f}{push:>12.2f}')
+
+    def run(self, follows, options):
+        reader = User.objects.create_user(username='bench_reader')
+        User.objects.bulk_create(
+            User(username=f'bench_author_{i}') for i in range(follows)
+        )
+        authors = list(
+            User.objects.filter(username__startswith='bench_author_')
+            .values_list('pk', flat=True)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author_id=pk) for pk in authors
+        )
+        Post.objects.bulk_create(
+            Post(text='Пост', author_id=pk)
+            for pk in authors
+            for _ in range(options['posts_per_author'])
+        )
+
+        def first_page():
+            posts, date_field = timeline_posts(reader)
+            paginator = CursorPaginator(posts, POSTS_PER_PAGE, date_field)
+            return list(paginator.get_cursor_page())
+
+        with override_settings(TIMELINE_MODE='pull'):
+            pull = timed(first_page, options['repeat'])
+        with override_settings(TIMELINE_MODE='push'):
+            for pk in authors:
+                backfill(reader.pk, pk)
+            push = timed(first_page, options['repeat'])
+        return pull, push
@@ -0,0 +1,80 @@
+from timeit import default_timer
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from posts.benchmarks import (QueryCounter, regressions, summarize,
+                              view_targets, write_report)
+
+
+class Command(BaseCommand):
+    help = ('Микробенчмарки лент и страницы поста через полный стек '
+            'Django на текущей базе. Пишет JSON-отчёт и сравнивает его '
+            'с эталоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Не очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument('--output', help='Путь для JSON-отчёта.')
+        parser.add_argument('--baseline', help='Отчёт для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=1.25,
+            help='Во сколько раз может вырасти p50 относительно эталона.',
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        self.stdout.write(
+            f'{"view":<14}{"запросов":>10}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}'
+        )
+        for name, (url, user) in view_targets().items():
+            result = self.run(url, user, options)
+            results[name] = result
+            self.stdout.write(
+                f'{name:<14}{result["queries"]:>10}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+            )
+        if options['output']:
+            write_report(
+                options['output'], 'views', results,
+                repeat=options['repeat'], warm_cache=options['warm_cache'],
+            )
+        if options['baseline']:
+            found = regressions(
+                results, options['baseline'], options['threshold']
+            )
+            for name, before, after in found:
+                self.stderr.write(
+                    f'{name}: p50 {before:.2f} -> {after:.2f} мс'
+                )
+            if found:
+                raise CommandError(f'Регрессий: {len(found)}')
+
+    def run(self, url, user, options):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+
+        def get():
+            if not options['warm_cache']:
+                cache.clear()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+
+        get()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            get()
+        samples = []
+        for _ in range(options['repeat']):
+            started = default_timer()
+            get()
+            samples.append((default_timer() - started) * 1000)
+        return {'url': url, 'queries': queries.count, **summarize(samples)}
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from core.models import StoredFile
+from posts.feed_cache import bump_feed_version, bump_tags
+from posts.models import Post, Thumbnail
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов, загруженные до хранилища с '
+            'адресацией по содержимому, под имена из хеша: одинаковые '
+            'файлы остаются в одном экземпляре. Печатает, сколько места '
+            'освободилось.')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = Post.objects.exclude(image='').exclude(
+            image__in=StoredFile.objects.values('name')
+        ).order_by().values_list('image', flat=True).distinct()
+        moved = missing = before = 0
+        stored_names = set()
+        for name in list(names):
+            if not storage.exists(name):
+                missing += 1
+                continue
+            before += storage.size(name)
+            with storage.open(name) as content:
+                stored = storage.save(name, content)
+            with transaction.atomic():
+                posts = Post.objects.filter(image=name)
+                # Одна ссылка уже есть от save(), остальные — остальные
+                # посты с этим файлом.
+                StoredFile.objects.filter(name=stored).update(
+                    references=F('references') + posts.count() - 1
+                )
+                Thumbnail.objects.filter(
+                    post__in=posts, source=name
+                ).update(source=stored)
+                posts.update(image=stored)
+            if stored != name:
+                storage.delete(name)
+            stored_names.add(stored)
+            moved += 1
+        after = sum(
+            StoredFile.objects.filter(
+                name__in=stored_names
+            ).values_list('size', flat=True)
+        )
+        if moved:
+            # В закэшированных страницах старые адреса картинок.
+            bump_feed_version()
+            bump_tags('posts')
+        self.stdout.write(
+            f'Перенесено файлов: {moved}, уникальных: {len(stored_names)}, '
+            f'не найдено: {missing}\n'
+            f'Занято было: {before} Б, стало: {after} Б'
+        )
@@ -0,0 +1,36 @@
+import sys
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, группы, комментарии или подписки '
+            'в NDJSON или CSV, не загружая выборку в память целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=bulk.MODELS)
+        parser.add_argument('path', help='Файл или - для stdout.')
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        model = bulk.MODELS[options['model']]
+        fmt = options['format'] or bulk.guess_format(options['path'])
+        header = [field.attname for field in bulk.columns(model)]
+        rows = model.objects.order_by('pk').values_list(*header).iterator(
+            chunk_size=options['chunk_size']
+        )
+        started = default_timer()
+        if options['path'] == '-':
+            total = bulk.write_rows(sys.stdout, fmt, header, rows)
+        else:
+            with open(options['path'], 'w', encoding='utf-8',
+                      newline='') as stream:
+                total = bulk.write_rows(stream, fmt, header, rows)
+        elapsed = default_timer() - started
+        self.stderr.write(
+            f'Выгружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        )
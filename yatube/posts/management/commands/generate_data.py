@@ -0,0 +1,62 @@
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand
+from posts.bulk import rebuild_derived
+from posts.synthetic import Generator
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками со степенным '
+            'распределением популярности. Данные остаются в базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument(
+            '--alpha', type=float, default=1.2,
+            help='Показатель закона Ципфа: чем больше, тем сильнее перекос.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--prefix', default='gen')
+
+    def handle(self, *args, **options):
+        generator = Generator(
+            seed=options['seed'],
+            alpha=options['alpha'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            prefix=options['prefix'],
+        )
+        users = self.step('пользователи', generator.users, options['users'])
+        groups = self.step('группы', generator.groups, options['groups'])
+        posts = self.step(
+            'посты', generator.posts, options['posts'], users, groups
+        )
+        if posts:
+            self.step(
+                'комментарии', generator.comments, options['comments'],
+                posts, users,
+            )
+        if len(users) > 1:
+            self.step(
+                'подписки', generator.follows, options['follows_per_user'],
+                users,
+            )
+        rebuild_derived(['post', 'comment', 'follow'], self.stdout)
+
+    def step(self, label, method, *args):
+        started = default_timer()
+        result = method(*args)
+        total = result if isinstance(result, int) else len(result)
+        elapsed = default_timer() - started
+        self.stdout.write(
+            f'{label}: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+        return result
@@ -0,0 +1,61 @@
+import sys
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает посты, группы, комментарии или подписки '
+            'из NDJSON или CSV пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=bulk.MODELS)
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--format', choices=bulk.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--ignore-conflicts',
+            action='store_true',
+            help='Пропускать строки с уже занятыми id.',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересчитывать счётчики, поиск и ленты после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        model = bulk.MODELS[options['model']]
+        fmt = options['format'] or bulk.guess_format(options['path'])
+        fields = bulk.columns(model)
+        started = default_timer()
+        total = 0
+        stream = self.open(options['path'])
+        try:
+            rows = bulk.read_rows(stream, fmt)
+            objects = (bulk.to_instance(model, fields, row) for row in rows)
+            with bulk.keep_dates(model):
+                for batch in bulk.batches(objects, options['batch_size']):
+                    with transaction.atomic():
+                        model.objects.bulk_create(
+                            batch,
+                            ignore_conflicts=options['ignore_conflicts'],
+                        )
+                    total += len(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = default_timer() - started
+        self.stdout.write(
+            f'Загружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+        if not options['no_rebuild']:
+            bulk.rebuild_derived([options['model']], self.stdout)
+
+    def open(self, path):
+        if path == '-':
+            return sys.stdin
+        return open(path, encoding='utf-8', newline='')
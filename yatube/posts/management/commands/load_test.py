@@ -0,0 +1,115 @@
+import random
+import threading
+from collections import Counter, defaultdict
+from timeit import default_timer
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from posts.benchmarks import (session_cookie, summarize, view_targets,
+                              write_report)
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер конкурентными GET-запросами к '
+            'лентам и странице поста. Адреса берутся из текущей базы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность в секундах, если не задан --requests.',
+        )
+        parser.add_argument('--requests', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='Путь для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        targets = [
+            (name, options['base_url'].rstrip('/') + url, session_cookie(user))
+            for name, (url, user) in view_targets().items()
+        ]
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.statuses = Counter()
+        self.left = options['requests']
+        deadline = default_timer() + options['duration']
+        workers = [
+            threading.Thread(
+                target=self.worker,
+                args=(targets, deadline, options['seed'] + number, options),
+            )
+            for number in range(options['concurrency'])
+        ]
+        started = default_timer()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = default_timer() - started
+        total = sum(self.statuses.values())
+        if not total:
+            raise CommandError('Ни один запрос не выполнен.')
+        results = {
+            name: summarize(samples)
+            for name, samples in sorted(self.samples.items())
+        }
+        results['all'] = summarize(
+            [value for samples in self.samples.values() for value in samples]
+        )
+        self.stdout.write(f'{"view":<14}{"p50, мс":>10}{"p95, мс":>10}'
+                          f'{"p99, мс":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+            )
+        throughput = total / elapsed
+        statuses = {status: count
+                    for status, count in sorted(self.statuses.items())}
+        self.stdout.write(
+            f'Запросов: {total} за {elapsed:.1f} с '
+            f'({throughput:.1f} в секунду), статусы: {statuses}'
+        )
+        if options['output']:
+            write_report(
+                options['output'], 'load', results,
+                base_url=options['base_url'],
+                concurrency=options['concurrency'],
+                requests=total,
+                seconds=round(elapsed, 3),
+                throughput=round(throughput, 2),
+                statuses=statuses,
+            )
+
+    def take(self, deadline):
+        with self.lock:
+            if self.left is None:
+                return default_timer() < deadline
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            return True
+
+    def worker(self, targets, deadline, seed, options):
+        chooser = random.Random(seed)
+        while self.take(deadline):
+            name, url, cookie = chooser.choice(targets)
+            request = Request(url)
+            if cookie:
+                request.add_header('Cookie', cookie)
+            started = default_timer()
+            try:
+                with urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            except (URLError, OSError):
+                status = 'error'
+            elapsed = (default_timer() - started) * 1000
+            with self.lock:
+                self.samples[name].append(elapsed)
+                self.statuses[str(status)] += 1
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from posts.models import Comment, Follow, Post, User, UserCounter
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def totals(queryset, field):
+    """{значение field: число строк} одним GROUP BY."""
+    return dict(
+        queryset.values_list(field).annotate(total=Count('pk')).order_by()
+    )
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, комментариев '
+            'и подписок. С --check только сообщает о расхождениях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Не исправлять, а завершиться с ошибкой при расхождениях.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            broken = self.sync_users(options['check'])
+            broken += self.sync_posts(options['check'])
+        if options['check'] and broken:
+            raise CommandError(f'Расхождений в счётчиках: {broken}')
+        action = 'Найдено' if options['check'] else 'Исправлено'
+        self.stdout.write(f'{action} расхождений: {broken}')
+
+    def sync_users(self, check):
+        actual = {
+            'posts_count': totals(Post.objects, 'author'),
+            'followers_count': totals(Follow.objects, 'author'),
+            'following_count': totals(Follow.objects, 'user'),
+        }
+        stored = UserCounter.objects.in_bulk()
+        broken = 0
+        changed = []
+        for pk in User.objects.values_list('pk', flat=True).iterator():
+            counter = stored.get(pk)
+            if counter is None:
+                counter = UserCounter(user_id=pk)
+                if not check:
+                    counter.save()
+            expected = {
+                field: actual[field].get(pk, 0) for field in USER_FIELDS
+            }
+            if all(getattr(counter, field) == value
+                   for field, value in expected.items()):
+                continue
+            broken += 1
+            self.report(f'user={pk}', counter, expected)
+            for field, value in expected.items():
+                setattr(counter, field, value)
+            changed.append(counter)
+        if not check:
+            UserCounter.objects.bulk_update(
+                changed, USER_FIELDS, batch_size=500
+            )
+        return broken
+
+    def sync_posts(self, check):
+        actual = totals(Comment.objects, 'post')
+        broken = 0
+        changed = []
+        posts = Post.objects.only('comments_count').order_by()
+        for post in posts.iterator():
+            expected = actual.get(post.pk, 0)
+            if post.comments_count == expected:
+                continue
+            broken += 1
+            self.report(f'post={post.pk}', post,
+                        {'comments_count': expected})
+            post.comments_count = expected
+            changed.append(post)
+        if not check:
+            Post.objects.bulk_update(
+                changed, ['comments_count'], batch_size=500
+            )
+        return broken
+
+    def report(self, label, obj, expected):
+        for field, value in expected.items():
+            stored = getattr(obj, field)
+            if stored != value:
+                self.stderr.write(
+                    f'{label} {field}: хранится {stored}, верно {value}'
+                )
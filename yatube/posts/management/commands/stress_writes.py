@@ -0,0 +1,147 @@
+import threading
+from collections import Counter, defaultdict
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import override_settings
+from core.db import is_locked, retry_write
+from posts.benchmarks import summarize, write_report
+from posts.models import Comment, Post, User
+from posts.views import comment_page
+
+MARKER = '[stress_writes]'
+
+# Умолчания SQLite явно: journal_mode хранится в файле, и после
+# прогона с WAL база иначе так в нём и останется.
+DEFAULT_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+
+
+class Command(BaseCommand):
+    help = ('Конкурентные записи комментариев и чтения страницы поста в '
+            'текущую базу: с умолчаниями SQLite и без повторов против '
+            'SQLITE_PRAGMAS и retry_write. Созданные комментарии удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на каждый режим.',
+        )
+        parser.add_argument(
+            '--modes', default='default,tuned',
+            help='Режимы через запятую: default, tuned.',
+        )
+        parser.add_argument('--output', help='Путь для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Сравнение имеет смысл только для SQLite.')
+        post = Post.objects.order_by('-pk').first()
+        users = list(User.objects.order_by('pk')[:options['writers']])
+        if post is None or not users:
+            raise CommandError('Нужны хотя бы один пост и пользователь.')
+        results = {}
+        for mode in options['modes'].split(','):
+            if mode not in ('default', 'tuned'):
+                raise CommandError(f'Неизвестный режим: {mode}')
+            try:
+                results[mode] = self.run(mode, post, users, options)
+            finally:
+                Comment.objects.filter(text__startswith=MARKER).delete()
+        self.stdout.write(
+            f'{"mode":<9}{"writes/s":>10}{"locked":>8}{"w p95, мс":>11}'
+            f'{"reads/s":>9}{"r p95, мс":>11}'
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<9}{result["writes_per_s"]:>10.1f}'
+                f'{result["locked"]:>8}{result["write"]["p95_ms"]:>11.2f}'
+                f'{result["reads_per_s"]:>9.1f}'
+                f'{result["read"]["p95_ms"]:>11.2f}'
+            )
+        if options['output']:
+            write_report(
+                options['output'], 'stress_writes', results,
+                writers=options['writers'], readers=options['readers'],
+                duration=options['duration'],
+            )
+
+    def run(self, mode, post, users, options):
+        pragmas = {}
+        if mode == 'default':
+            pragmas['SQLITE_PRAGMAS'] = DEFAULT_PRAGMAS
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.lock = threading.Lock()
+        with override_settings(**pragmas):
+            # Соединения открываются заново и получают PRAGMA режима.
+            connection.close()
+            deadline = default_timer() + options['duration']
+            workers = [
+                threading.Thread(
+                    target=self.writer, args=(mode, post, user, deadline)
+                )
+                for user in (users * options['writers'])[:options['writers']]
+            ] + [
+                threading.Thread(target=self.reader, args=(post, deadline))
+                for _ in range(options['readers'])
+            ]
+            started = default_timer()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = default_timer() - started
+            connection.close()
+        writes, reads = self.samples['write'], self.samples['read']
+        if not writes or not reads:
+            raise CommandError(f'{mode}: нет ни одной успешной операции.')
+        return {
+            'write': summarize(writes),
+            'read': summarize(reads),
+            'writes_per_s': round(len(writes) / elapsed, 2),
+            'reads_per_s': round(len(reads) / elapsed, 2),
+            'locked': self.errors['locked'],
+            'failed': self.errors['other'],
+        }
+
+    def writer(self, mode, post, user, deadline):
+        try:
+            while default_timer() < deadline:
+                comment = Comment(post=post, author=user, text=MARKER)
+                started = default_timer()
+                try:
+                    if mode == 'tuned':
+                        retry_write(comment.save)
+                    else:
+                        comment.save()
+                except OperationalError as error:
+                    self.count_error(error)
+                    continue
+                self.add('write', started)
+        finally:
+            connection.close()
+
+    def reader(self, post, deadline):
+        try:
+            while default_timer() < deadline:
+                started = default_timer()
+                try:
+                    list(comment_page(post.pk))
+                except OperationalError as error:
+                    self.count_error(error)
+                    continue
+                self.add('read', started)
+        finally:
+            connection.close()
+
+    def add(self, kind, started):
+        elapsed = (default_timer() - started) * 1000
+        with self.lock:
+            self.samples[kind].append(elapsed)
+
+    def count_error(self, error):
+        with self.lock:
+            self.errors['locked' if is_locked(error) else 'other'] += 1
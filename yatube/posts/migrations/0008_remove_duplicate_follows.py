@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет самую раннюю из одинаковых подписок (user, author).
+
+    Исторические модели не шлют сигналов, поэтому счётчики подписок
+    затронутых пользователей пересчитываются здесь же.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    duplicates = (
+        Follow.objects.values('user', 'author')
+        .annotate(first=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    touched = set()
+    for row in list(duplicates):
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['first']).delete()
+        touched.update((row['user'], row['author']))
+    for pk in touched:
+        UserCounter.objects.filter(user_id=pk).update(
+            followers_count=Follow.objects.filter(author_id=pk).count(),
+            following_count=Follow.objects.filter(user_id=pk).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+    ]
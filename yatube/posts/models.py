@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -24,6 +25,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Всё, что нужно шаблону post.html, одним запросом."""
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__title',
+            'group__slug',
+        ).prefetch_related('thumbnails')
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -52,11 +68,35 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты листаются по (pub_date, id) от новых к старым; id в
+        # индексе нужен keyset-пагинации для разрешения равных дат.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -78,6 +118,14 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='posts_comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -91,5 +139,98 @@ class Follow(models.Model):
         related_name='following',
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+
     def __str__(self) -> str:
         return f'{self.user} is following {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Заполняется рассылкой при публикации (posts.timeline).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    # Копия post.pub_date: лента читается по индексу без сортировки.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_timeline_user_date',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+
+class Thumbnail(models.Model):
+    """Заранее построенная миниатюра картинки поста.
+
+    Строится в фоне (posts.thumbnails), шаблоны только читают url.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnails',
+    )
+    variant = models.CharField('Вариант', max_length=20)
+    source = models.CharField('Исходный файл', max_length=255)
+    url = models.CharField('Адрес', max_length=255)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        unique_together = ('post', 'variant')
+        verbose_name = 'Миниатюра'
+        verbose_name_plural = 'Миниатюры'
+
+    def __str__(self) -> str:
+        return f'{self.variant} {self.source}'
+
+
+class UserCounter(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами из posts.signals, пересчитываются командой
+    rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counter',
+        primary_key=True,
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user}'
@@ -0,0 +1,121 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страница хранится по пути и query string вместе с версиями своих тегов
+('posts', 'post:<id>', 'author:<id>', 'group:<id>', 'group:<slug>',
+'profile:<username>'). Сигналы меняют версии тегов при записи постов,
+комментариев, групп и пользователей, и устаревшая
+страница просто перестаёт совпадать. Пересчёт идёт через
+core.cache.fetch(): страницу рендерит один запрос, параллельные
+получают прежнюю версию или ждут его.
+
+Персональные куски (шапка, вкладки лент, кнопка подписки, форма
+комментария) выводятся тегом {% hole %}. В кэшируемую страницу он
+пишет подписанную метку, а перед отдачей метки заменяются фрагментами
+из отдельного кэша. Вошедшие пользователи кэш страниц обходят.
+"""
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from django.template.loader import render_to_string
+from core.cache import DoNotCache, fetch
+from .feed_cache import tag_versions
+
+HOLE_SALT = 'posts.page_cache.hole'
+HOLE_RE = re.compile(rb'<!--hole:([\w\-:.]+)-->')
+
+
+def _key(prefix, *parts):
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return f'{prefix}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def hole_marker(template_name, values):
+    payload = signing.dumps([template_name, values], salt=HOLE_SALT)
+    return f'<!--hole:{payload}-->'
+
+
+def render_hole(request, template_name, values):
+    """Фрагмент для анонимного посетителя: зависит только от шаблона,
+    его аргументов и текущего view."""
+    match = request.resolver_match
+    key = _key(
+        'hole', template_name, values, match.view_name if match else None
+    )
+    content = cache.get(key)
+    if content is None:
+        content = render_to_string(template_name, values, request=request)
+        cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+    return content
+
+
+def fill_holes(request, content):
+    def replace(match):
+        template_name, values = signing.loads(
+            match.group(1).decode(), salt=HOLE_SALT
+        )
+        return render_hole(request, template_name, values).encode()
+    return HOLE_RE.sub(replace, content)
+
+
+def add_page_tags(request, *tags):
+    """Теги, известные только внутри view (автор и группа поста)."""
+    if hasattr(request, 'page_cache_tags'):
+        request.page_cache_tags.update(tag_versions(tags))
+
+
+def anonymous_page_cache(*tags):
+    """Декоратор view. Элементы tags — строки с полями из kwargs view:
+    'post:{post_id}'."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated
+                    or not settings.PAGE_CACHE_TIMEOUT):
+                return view(request, *args, **kwargs)
+
+            def render():
+                # Версии читаем до рендера: запись во время рендера не
+                # спрячется за свежей версией.
+                request.page_cache_tags = tag_versions(
+                    tag.format(**kwargs) for tag in tags
+                )
+                request.page_holes = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    # Страницу ошибки обработчик рендерит уже без меток.
+                    request.page_holes = False
+                if response.streaming or response.status_code != 200:
+                    raise DoNotCache(response)
+                return {
+                    'tags': request.page_cache_tags,
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }
+
+            entry = fetch(
+                _key('page', request.get_full_path()),
+                render,
+                settings.PAGE_CACHE_TIMEOUT,
+                is_valid=lambda entry: (
+                    tag_versions(entry['tags']) == entry['tags']
+                ),
+            )
+            if isinstance(entry, HttpResponseBase):
+                if not entry.streaming:
+                    entry.content = fill_holes(request, entry.content)
+                return entry
+            return HttpResponse(
+                fill_holes(request, entry['content']),
+                content_type=entry['content_type'],
+            )
+        return wrapper
+    return decorator
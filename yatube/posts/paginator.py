@@ -0,0 +1,127 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, pub_date, pk):
+    """Упаковывает ключ (pub_date, id) в непрозрачный токен."""
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает токен. Для битого токена возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации.
+
+    Номер страницы неизвестен: вместо него есть курсоры соседних страниц.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (дата, id) без COUNT(*) и OFFSET.
+
+    Стоимость запроса не зависит от глубины страницы: каждый переход
+    начинается с последнего показанного ключа.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 ascending=False):
+        # date_field позволяет листать по копии pub_date из другой
+        # таблицы (аннотации) и читать по её индексу. ascending — для
+        # списков от старых к новым, как комментарии.
+        self.date_field = date_field
+        self.ascending = ascending
+        order = '' if ascending else '-'
+        super().__init__(
+            object_list.order_by(f'{order}{date_field}', f'{order}pk'),
+            per_page,
+        )
+
+    def _after(self, queryset, pub_date, pk, forward=True):
+        """Объекты за ключом в порядке показа (forward) или перед ним."""
+        lookup = 'gt' if forward == self.ascending else 'lt'
+        field = self.date_field
+        return queryset.filter(
+            Q(**{f'{field}__{lookup}': pub_date})
+            | Q(**{field: pub_date, f'pk__{lookup}': pk})
+        )
+
+    def _cursor(self, direction, item):
+        # Строки values() листаются так же, если в них есть pk и дата.
+        if isinstance(item, dict):
+            return encode_cursor(direction, item[self.date_field],
+                                 item['pk'])
+        return encode_cursor(direction, getattr(item, self.date_field),
+                             item.pk)
+
+    def get_cursor_page(self, cursor=None):
+        key = decode_cursor(cursor) if cursor else None
+        if key is None:
+            return self._build_page(self._slice(self.object_list), False)
+        direction, pub_date, pk = key
+        if direction == NEXT:
+            queryset = self._after(self.object_list, pub_date, pk)
+            return self._build_page(self._slice(queryset), True)
+        queryset = self._after(
+            self.object_list, pub_date, pk, forward=False
+        ).reverse()
+        items = self._slice(queryset)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        next_cursor = None
+        if items:
+            next_cursor = self._cursor(NEXT, items[-1])
+        previous_cursor = None
+        if has_more:
+            previous_cursor = self._cursor(PREVIOUS, items[0])
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+    def _slice(self, queryset):
+        return list(queryset[:self.per_page + 1])
+
+    def _build_page(self, items, has_previous):
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        next_cursor = None
+        if has_more:
+            next_cursor = self._cursor(NEXT, items[-1])
+        previous_cursor = None
+        if has_previous and items:
+            previous_cursor = self._cursor(PREVIOUS, items[0])
+        return CursorPage(items, self, next_cursor, previous_cursor)
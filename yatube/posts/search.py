@@ -0,0 +1,168 @@
+"""Полнотекстовый поиск по постам.
+
+Движок выбирается настройкой SEARCH_BACKEND. Любой движок реализует
+интерфейс SearchBackend; индекс обновляется сигналами при записи постов
+и пересобирается командой rebuild_search_index.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections, router
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from .models import Post
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchBackend:
+    """Интерфейс поискового движка."""
+
+    def index(self, post):
+        """Добавляет или обновляет пост в индексе."""
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        """Убирает пост из индекса."""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Строит индекс заново по всем постам."""
+        raise NotImplementedError
+
+    def count(self, query):
+        raise NotImplementedError
+
+    def ids(self, query, offset, limit):
+        """id найденных постов по убыванию релевантности."""
+        raise NotImplementedError
+
+
+class SimpleBackend(SearchBackend):
+    """Поиск через LIKE: без индекса, зато на любой базе."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def _queryset(self, query):
+        posts = Post.objects.all()
+        for word in WORD_RE.findall(query):
+            posts = posts.filter(text__icontains=word)
+        return posts
+
+    def count(self, query):
+        return self._queryset(query).count()
+
+    def ids(self, query, offset, limit):
+        return list(self._queryset(query).values_list(
+            'pk', flat=True
+        )[offset:offset + limit])
+
+
+class SqliteFTS5Backend(SearchBackend):
+    """Инвертированный индекс SQLite FTS5, ранжирование по bm25.
+
+    Таблица posts_post_fts создаётся миграцией 0011_search_index,
+    rowid в ней совпадает с id поста.
+    """
+    table = 'posts_post_fts'
+
+    def match(self, query):
+        # Каждое слово — отдельная фраза в кавычках: синтаксис FTS5
+        # из пользовательского ввода не интерпретируется.
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"' for word in words)
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')"
+            )
+
+    def read_connection(self):
+        # Поиск читает с той же базы, что и ORM: с реплики, если view
+        # читает с неё.
+        return connections[router.db_for_read(Post)]
+
+    def count(self, query):
+        match = self.match(query)
+        if not match:
+            return 0
+        with self.read_connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s',
+                [match],
+            )
+            return cursor.fetchone()[0]
+
+    def ids(self, query, offset, limit):
+        match = self.match(query)
+        if not match:
+            return []
+        with self.read_connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+class SearchResults:
+    """Ленивая выдача для Paginator: считает и режет через движок,
+    посты грузит только для текущей страницы."""
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+
+    @cached_property
+    def _count(self):
+        return self.backend.count(self.query)
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        offset = item.start or 0
+        ids = self.backend.ids(self.query, offset, item.stop - offset)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
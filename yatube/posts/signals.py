@@ -0,0 +1,226 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from . import search, thumbnails, timeline
+from .feed_cache import (bump_feed_version, bump_follow_version,
+                         bump_post_version, bump_tags, forget_post_tags)
+from .models import (Comment, Follow, Group, Post, Thumbnail, User,
+                     UserCounter)
+
+
+def bump_user_counter(user_id, create=False, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas.
+
+    Строка создаётся только при create=True: при каскадном удалении
+    пользователя его счётчики уже удалены, и воскрешать их нельзя.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = UserCounter.objects.filter(user_id=user_id).update(**changes)
+    if not updated and create:
+        UserCounter.objects.get_or_create(user_id=user_id)
+        UserCounter.objects.filter(user_id=user_id).update(**changes)
+
+
+# Поля, которые выводятся на страницах: имя в карточках и шапках.
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def create_user_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_counter(instance.author_id, create=True, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user_counter(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    # Рассылка по подписчикам долгая: уходит в очередь задач.
+    if created and not raw and timeline.mode() != 'pull':
+        timeline.fan_out_by_id.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw and thumbnails.is_stale(instance):
+        post_id = instance.pk
+        transaction.on_commit(lambda: thumbnails.schedule(post_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+def release_image(sender, name):
+    # Файл отпускается только после коммита: откат оставит ссылку.
+    storage = sender._meta.get_field('image').storage
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Сырое имя из базы; отложенное поле не читаем, чтобы не делать
+    # запрос на каждый пост ленты.
+    name = instance.__dict__.get('image')
+    instance._stored_image = name if isinstance(name, str) else None
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, raw=False, **kwargs):
+    # Новый файл сохранится в хранилище уже после сигнала.
+    instance._uploading_image = (
+        not raw and 'image' in instance.__dict__
+        and bool(instance.image) and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    if raw or 'image' not in instance.__dict__:
+        return
+    stored, current = instance._stored_image, instance.image.name
+    # Загрузка тех же байтов получает прежнее имя, но save() хранилища
+    # уже добавил ей ссылку: старую всё равно нужно снять.
+    uploaded = getattr(instance, '_uploading_image', False)
+    if stored and (stored != current or uploaded):
+        release_image(sender, stored)
+    instance._stored_image = current
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.__dict__.get('image'):
+        release_image(sender, instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_feed_version()
+        bump_tags(
+            'posts', f'post:{instance.pk}', f'author:{instance.author_id}'
+        )
+        forget_post_tags(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login.
+    if created or raw or (
+        update_fields is not None and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    bump_feed_version()
+    bump_tags(
+        'posts', f'author:{instance.pk}', f'profile:{instance.username}'
+    )
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    instance._stored_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # При смене slug страница по старому адресу стала 404.
+        slugs = {instance._stored_slug, instance.slug} - {None}
+        bump_tags(
+            'posts', f'group:{instance.pk}',
+            *(f'group:{slug}' for slug in slugs)
+        )
+        instance._stored_slug = instance.slug
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_follow_version(instance.user_id)
+        # Счётчики подписчиков и подписок в шапках профилей. Имена
+        # одним запросом: связи при каскадном удалении не загружены.
+        usernames = User.objects.filter(
+            pk__in=(instance.user_id, instance.author_id)
+        ).values_list('username', flat=True)
+        bump_tags(*(f'profile:{username}' for username in usernames))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Thumbnail)
+def invalidate_post_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_post_version(instance.post_id)
+        bump_tags(f'post:{instance.post_id}')
+        if sender is Thumbnail:
+            # Миниатюра меняет и карточку поста в закэшированных лентах.
+            bump_feed_version()
+            bump_tags('posts')
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=F('comments_count') - 1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_user_counter(instance.author_id, create=True, followers_count=1)
+        bump_user_counter(instance.user_id, create=True, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user_counter(instance.author_id, followers_count=-1)
+    bump_user_counter(instance.user_id, following_count=-1)
+
+
+@receiver(post_delete, sender=Follow)
+def refan_unpulled_author(sender, instance, **kwargs):
+    # После count_deleted_follow: счётчик подписчиков уже уменьшен.
+    if timeline.dropped_to_limit(instance.author_id):
+        timeline.refan_author.delay(instance.author_id)
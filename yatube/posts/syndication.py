@@ -0,0 +1,240 @@
+"""Ленты для читалок: RSS 2.0, Atom и JSON Feed.
+
+Документ собирается генератором и отдаётся StreamingHttpResponse по
+одному посту, из запроса с LIMIT по индексу (дата, id). Пока ответ
+уходит клиенту, куски копятся и в конце ложатся в кэш под ключом с
+версиями тегов page_cache: запись поста меняет версию, и следующий
+запрос соберёт ленту заново. Повторные опросы с тем же ETag получают
+304 от conditional_page.
+"""
+import hashlib
+import json
+from functools import wraps
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+from django.views.decorators.http import require_safe
+from core.db import reads_from_replica
+from .conditional import conditional_page
+from .feed_cache import tag_versions
+from .models import Group, Post, User
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+SITE_TITLE = 'Yatube'
+# Между записями: в JSON Feed это элементы массива.
+SEPARATORS = {'json': ','}
+
+
+class Feed:
+    """Что показывает лента: заголовок, адреса и посты."""
+
+    def __init__(self, request, fmt, title, page_url, feed_url, posts):
+        self.request = request
+        self.fmt = fmt
+        self.title = title
+        self.page_url = request.build_absolute_uri(page_url)
+        self.feed_url = request.build_absolute_uri(feed_url)
+        # Генератор выполнится после выхода из view: базу выбираем сейчас,
+        # пока действует reads_from_replica.
+        self.posts = posts.using(router.db_for_read(Post)).order_by(
+            '-pub_date', '-pk'
+        ).values(
+            'pk', 'text', 'pub_date', 'author__username',
+            'author__first_name', 'author__last_name',
+        )[:settings.SYNDICATION_ITEMS]
+
+    def post_url(self, row):
+        return self.request.build_absolute_uri(
+            reverse('posts:post_detail', kwargs={'post_id': row['pk']})
+        )
+
+    def chunks(self):
+        header, item, footer = (
+            getattr(self, f'{self.fmt}_{part}')
+            for part in ('header', 'item', 'footer')
+        )
+        rows = self.posts.iterator()
+        first = next(rows, None)
+        # Atom требует дату и у пустой ленты.
+        yield header(first['pub_date'] if first else timezone.now())
+        if first is not None:
+            yield item(first)
+            separator = SEPARATORS.get(self.fmt, '')
+            for row in rows:
+                yield separator + item(row)
+        yield footer()
+
+    def rss_header(self, updated):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rss version="2.0" '
+            'xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+            f'<title>{escape(self.title)}</title>'
+            f'<link>{escape(self.page_url)}</link>'
+            f'<description>{escape(self.title)}</description>'
+            f'<atom:link href={quoteattr(self.feed_url)} rel="self"/>'
+            '<language>ru</language>'
+            f'<lastBuildDate>{rfc2822_date(updated)}</lastBuildDate>'
+        )
+
+    def rss_item(self, row):
+        url = escape(self.post_url(row))
+        return (
+            f'<item><title>{escape(title(row))}</title>'
+            f'<link>{url}</link><guid>{url}</guid>'
+            f'<pubDate>{rfc2822_date(row["pub_date"])}</pubDate>'
+            f'<description>{escape(row["text"])}</description></item>'
+        )
+
+    def rss_footer(self):
+        return '</channel></rss>\n'
+
+    def atom_header(self, updated):
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+            f'<title>{escape(self.title)}</title>'
+            f'<link href={quoteattr(self.page_url)} rel="alternate"/>'
+            f'<link href={quoteattr(self.feed_url)} rel="self"/>'
+            f'<id>{escape(self.page_url)}</id>'
+            f'<updated>{rfc3339_date(updated)}</updated>'
+        )
+
+    def atom_item(self, row):
+        url = self.post_url(row)
+        date = rfc3339_date(row['pub_date'])
+        return (
+            f'<entry><title>{escape(title(row))}</title>'
+            f'<link href={quoteattr(url)} rel="alternate"/>'
+            f'<id>{escape(url)}</id>'
+            f'<published>{date}</published><updated>{date}</updated>'
+            f'<author><name>{escape(author(row))}</name></author>'
+            f'<content type="text">{escape(row["text"])}</content></entry>'
+        )
+
+    def atom_footer(self):
+        return '</feed>\n'
+
+    def json_header(self, updated):
+        header = json.dumps({
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.title,
+            'home_page_url': self.page_url,
+            'feed_url': self.feed_url,
+            'language': 'ru',
+        }, ensure_ascii=False)
+        return header[:-1] + ',"items":['
+
+    def json_item(self, row):
+        url = self.post_url(row)
+        return json.dumps({
+            'id': url,
+            'url': url,
+            'title': title(row),
+            'content_text': row['text'],
+            'date_published': rfc3339_date(row['pub_date']),
+            'authors': [{'name': author(row)}],
+        }, ensure_ascii=False)
+
+    def json_footer(self):
+        return ']}\n'
+
+
+def title(row):
+    return Truncator(' '.join(row['text'].split())).chars(60)
+
+
+def author(row):
+    full_name = f'{row["author__first_name"]} {row["author__last_name"]}'
+    return full_name.strip() or row['author__username']
+
+
+def cached_stream(key, chunks):
+    """Отдаёт куски и по окончании кладёт документ в кэш. Если клиент
+    ушёл раньше, недособранный документ не сохраняется."""
+    collected = []
+    for chunk in chunks:
+        chunk = chunk.encode()
+        collected.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(collected), settings.SYNDICATION_CACHE_TIMEOUT)
+
+
+def syndication_view(*tags):
+    """Лента в формате kwargs['fmt'], которую описывает Feed из view.
+
+    Готовый документ берётся из кэша без запросов к базе; ключ включает
+    версии тегов page_cache, так что запись поста его сменит.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, fmt, **kwargs):
+            if fmt not in CONTENT_TYPES:
+                raise Http404('Неизвестный формат ленты')
+            # В документе абсолютные адреса: ключ зависит и от хоста.
+            url = request.build_absolute_uri()
+            key = ':'.join(map(str, (
+                'syndication', hashlib.md5(url.encode()).hexdigest(),
+                *tag_versions(tags).values(),
+            )))
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(content, content_type=CONTENT_TYPES[fmt])
+            feed = view(request, fmt=fmt, **kwargs)
+            return StreamingHttpResponse(
+                cached_stream(key, feed.chunks()),
+                content_type=CONTENT_TYPES[fmt],
+            )
+        return require_safe(conditional_page('syndication')(
+            reads_from_replica(wrapper)
+        ))
+    return decorator
+
+
+@syndication_view('posts')
+def index_feed(request, fmt):
+    return Feed(
+        request, fmt, f'{SITE_TITLE}: последние записи',
+        reverse('posts:index'),
+        reverse('posts:index_feed', kwargs={'fmt': fmt}),
+        Post.objects.all(),
+    )
+
+
+@syndication_view('posts')
+def group_feed(request, fmt, slug):
+    group = get_object_or_404(Group.objects.only('title'), slug=slug)
+    return Feed(
+        request, fmt, f'{SITE_TITLE}: {group.title}',
+        reverse('posts:group_list', kwargs={'slug': slug}),
+        reverse('posts:group_feed', kwargs={'slug': slug, 'fmt': fmt}),
+        Post.objects.filter(group_id=group.pk),
+    )
+
+
+@syndication_view('posts')
+def profile_feed(request, fmt, username):
+    author = get_object_or_404(
+        User.objects.only('username'), username=username
+    )
+    return Feed(
+        request, fmt, f'{SITE_TITLE}: записи {username}',
+        reverse('posts:profile', kwargs={'username': username}),
+        reverse(
+            'posts:profile_feed', kwargs={'username': username, 'fmt': fmt}
+        ),
+        Post.objects.filter(author_id=author.pk),
+    )
@@ -0,0 +1,142 @@
+"""Синтетические данные для нагрузочных тестов.
+
+Авторы постов, обсуждаемые посты и цели подписок выбираются по закону
+Ципфа: немного популярных авторов и длинный хвост, как в живой соцсети.
+Всё пишется пачками bulk_create, сигналы не срабатывают — производные
+данные догоняет bulk.rebuild_derived().
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from .bulk import batches, keep_dates
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    'день ночь утро вечер солнце мороз снег дождь ветер море река лес '
+    'город дом окно дорога книга письмо песня слово друг время жизнь '
+    'работа отпуск поезд кофе чай кот собака сад весна лето осень зима'
+).split()
+
+
+def zipf_weights(size, alpha):
+    """Накопленные веса для random.choices: вес ранга r равен r^-alpha."""
+    return list(accumulate(rank ** -alpha for rank in range(1, size + 1)))
+
+
+class Generator:
+    def __init__(self, seed=0, alpha=1.2, batch_size=1000, days=365,
+                 prefix='gen'):
+        self.random = random.Random(seed)
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.days = days
+        self.prefix = prefix
+        self.now = timezone.now()
+
+    def date(self):
+        return self.now - timedelta(
+            seconds=self.random.randrange(self.days * 24 * 60 * 60)
+        )
+
+    def text(self, low=5, high=60):
+        return ' '.join(
+            self.random.choices(WORDS, k=self.random.randint(low, high))
+        ).capitalize()
+
+    def insert(self, model, objects, **options):
+        total = 0
+        with keep_dates(model):
+            for batch in batches(objects, self.batch_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, **options)
+                total += len(batch)
+        return total
+
+    def new_ids(self, model, objects, **options):
+        """Вставляет объекты и возвращает id новых строк."""
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.insert(model, objects, **options)
+        return list(model.objects.filter(pk__gt=last).order_by('pk')
+                    .values_list('pk', flat=True))
+
+    def users(self, count):
+        start = User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).count()
+        return self.new_ids(User, (
+            User(username=f'{self.prefix}_{start + i}', password='!')
+            for i in range(count)
+        ))
+
+    def groups(self, count):
+        start = Group.objects.filter(
+            slug__startswith=f'{self.prefix}-'
+        ).count()
+        return self.new_ids(Group, (
+            Group(
+                title=f'Группа {start + i}',
+                slug=f'{self.prefix}-{start + i}',
+                description=self.text(3, 10),
+            )
+            for i in range(count)
+        ))
+
+    def posts(self, count, authors, groups):
+        weights = zipf_weights(len(authors), self.alpha)
+        choices = [None] + list(groups)
+
+        def make():
+            for author in self.random.choices(
+                authors, cum_weights=weights, k=count
+            ):
+                yield Post(
+                    text=self.text(),
+                    author_id=author,
+                    group_id=self.random.choice(choices),
+                    pub_date=self.date(),
+                )
+        return self.new_ids(Post, make())
+
+    def comments(self, count, posts, authors):
+        post_weights = zipf_weights(len(posts), self.alpha)
+
+        def make():
+            for post in self.random.choices(
+                posts, cum_weights=post_weights, k=count
+            ):
+                yield Comment(
+                    post_id=post,
+                    author_id=self.random.choice(authors),
+                    text=self.text(1, 20),
+                    created=self.date(),
+                )
+        return self.insert(Comment, make())
+
+    def follows(self, per_user, users):
+        """Число подписок пользователя распределено экспоненциально
+        со средним per_user, цели — по Ципфу."""
+        weights = zipf_weights(len(users), self.alpha)
+
+        def make():
+            for user in users:
+                wanted = min(
+                    len(users) // 2,
+                    int(self.random.expovariate(1 / per_user)),
+                )
+                authors = set()
+                while len(authors) < wanted:
+                    authors.update(self.random.choices(
+                        users, cum_weights=weights, k=wanted - len(authors)
+                    ))
+                    authors.discard(user)
+                for author in authors:
+                    yield Follow(user_id=user, author_id=author)
+        return self.insert(Follow, make(), ignore_conflicts=True)
@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+from ..page_cache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **values):
+    """Персональный фрагмент страницы.
+
+    В странице, которая уходит в кэш, оставляет метку; иначе рендерит
+    шаблон на месте. Шаблон может опираться только на user, request и
+    переданные values: при заполнении метки другого контекста нет.
+    """
+    request = context.get('request')
+    if getattr(request, 'page_holes', False):
+        return mark_safe(hole_marker(template_name, values))
+    nested = context.template.engine.get_template(template_name)
+    with context.push(**values):
+        return nested.render(context)
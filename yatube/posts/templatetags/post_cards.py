@@ -0,0 +1,95 @@
+from urllib.parse import quote
+
+from django import template
+from django.urls import reverse
+from django.utils import formats
+from django.utils.html import escape
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
+from .post_thumbnails import post_thumbnail
+
+register = template.Library()
+
+# Подставляется в reverse() вместо аргумента: подходит и к int, и к
+# slug, и к str.
+PLACEHOLDER = '8231547906'
+
+
+class CardRenderer:
+    """Адреса и даты для карточек одного рендера: reverse() и формат
+    даты считаются один раз, а не для каждого поста."""
+
+    def __init__(self, use_tz):
+        self.use_tz = use_tz
+        self.patterns = {}
+        self.dates = {}
+
+    def url(self, name, value):
+        if name not in self.patterns:
+            self.patterns[name] = reverse(name, args=[PLACEHOLDER])
+        # Так же, как reverse() экранирует подставленный аргумент.
+        return self.patterns[name].replace(
+            PLACEHOLDER, quote(str(value), safe=RFC3986_SUBDELIMS + '/~:@')
+        )
+
+    def date(self, value):
+        value = template_localtime(value, self.use_tz)
+        day = value.date()
+        if day not in self.dates:
+            self.dates[day] = formats.date_format(value, 'j E Y')
+        return self.dates[day]
+
+    def render(self, post, show_author):
+        parts = ['<article>\n  <ul>\n']
+        if show_author:
+            parts.append(
+                '    <li>\n'
+                f'      Автор: {escape(post.author.get_full_name())}\n'
+                '      <a href="'
+                f'{self.url("posts:profile", post.author.username)}">\n'
+                '        все посты пользователя\n'
+                '      </a>\n'
+                '    </li>\n'
+            )
+        parts.append(
+            f'    <li>Дата публикации: {self.date(post.pub_date)}</li>\n'
+            '  </ul>\n'
+        )
+        thumbnail = post_thumbnail(post, 'card')
+        if thumbnail:
+            parts.append(
+                f'  <img src="{escape(thumbnail.url)}" '
+                f'width="{thumbnail.width}" height="{thumbnail.height}">\n'
+            )
+        elif post.image:
+            parts.append(
+                f'  <img src="{escape(post.image.url)}" width="960">\n'
+            )
+        parts.append(
+            f'  <p>{escape(post.text)}</p>\n'
+            f'  <a href="{self.url("posts:post_detail", post.pk)}">'
+            'подробная информация </a>\n'
+            '</article>\n'
+        )
+        if post.group_id:
+            parts.append(
+                f'<a href="{self.url("posts:group_list", post.group.slug)}">'
+                'все записи группы</a>\n'
+            )
+        return mark_safe(''.join(parts))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста в ленте; без автора, если в контексте есть profile.
+
+    Её рендерят для каждого поста каждой ленты, поэтому разметка
+    собирается в Python, а не {% include %} шаблона.
+    """
+    renderer = context.render_context.get(CardRenderer)
+    if renderer is None:
+        renderer = context.render_context[CardRenderer] = CardRenderer(
+            context.use_tz
+        )
+    return renderer.render(post, show_author=not context.get('profile'))
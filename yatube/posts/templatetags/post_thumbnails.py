@@ -0,0 +1,19 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, variant):
+    """Готовая миниатюра поста или None, если она ещё строится.
+
+    Картинку в запросе не обрабатывает: только читает thumbnails,
+    которые лента подгружает через prefetch_related.
+    """
+    if not post.image:
+        return None
+    for thumbnail in post.thumbnails.all():
+        if thumbnail.variant == variant:
+            if thumbnail.source == post.image.name:
+                return thumbnail
+    return None
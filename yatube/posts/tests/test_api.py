@@ -0,0 +1,141 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой',
+        )
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTest.user)
+
+    def get(self, name, params=None, client=None, **kwargs):
+        response = (client or self.guest_client).get(
+            reverse(f'api:{name}', kwargs=kwargs), params or {}
+        )
+        return response, json.loads(response.content)
+
+    def test_api_posts_are_paged_by_cursor(self):
+        newest_first = [post.pk for post in reversed(ApiTest.posts)]
+        response, data = self.get('posts', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post['id'] for post in data['results']], newest_first[:3]
+        )
+        self.assertIsNone(data['previous_cursor'])
+        _, data = self.get(
+            'posts', {'limit': 3, 'cursor': data['next_cursor']}
+        )
+        self.assertEqual(
+            [post['id'] for post in data['results']], newest_first[3:]
+        )
+        self.assertIsNone(data['next_cursor'])
+        _, data = self.get(
+            'posts', {'limit': 3, 'cursor': data['previous_cursor']}
+        )
+        self.assertEqual(
+            [post['id'] for post in data['results']], newest_first[:3]
+        )
+
+    def test_api_fields_limit_response_and_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get('posts', {'fields': 'id,author'})
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        self.assertEqual(data['results'][0]['author'], 'author')
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"username"', select)
+        self.assertNotIn('"text"', select)
+        response, data = self.get('posts', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_api_post_and_comments(self):
+        post = ApiTest.posts[0]
+        first = Comment.objects.create(
+            post=post, author=ApiTest.user, text='Первый'
+        )
+        second = Comment.objects.create(
+            post=post, author=ApiTest.user, text='Второй'
+        )
+        _, data = self.get('post', post_id=post.pk)
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], 'test')
+        self.assertEqual(data['comments_count'], 2)
+        self.assertIsNone(data['image'])
+        _, data = self.get('post_comments', post_id=post.pk)
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            [first.pk, second.pk],
+        )
+        for name in ('post', 'post_comments'):
+            with self.subTest(name=name):
+                response, data = self.get(name, post_id=0)
+                self.assertEqual(response.status_code, 404)
+
+    def test_api_groups_and_profiles(self):
+        _, data = self.get('groups')
+        self.assertEqual(data['results'], [{
+            'id': ApiTest.group.pk,
+            'slug': 'test',
+            'title': 'Тестовая группа',
+            'description': 'Тестовое описание',
+        }])
+        _, data = self.get('group_posts', slug='test', params={'limit': 1})
+        self.assertEqual(data['results'][0]['id'], ApiTest.posts[-1].pk)
+        _, data = self.get('profile', username='author')
+        self.assertEqual(data['last_name'], 'Толстой')
+        self.assertEqual(data['posts_count'], 5)
+        self.assertEqual(data['followers_count'], 1)
+        _, data = self.get('profile_posts', username='author')
+        self.assertEqual(len(data['results']), 5)
+        response, _ = self.get('profile', username='nobody')
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_follow_feed_needs_login(self):
+        response, _ = self.get('follow')
+        self.assertEqual(response.status_code, 401)
+        _, data = self.get('follow', client=self.authorized_client)
+        self.assertEqual(len(data['results']), 5)
+
+    def test_api_responses_are_gzipped_and_conditional(self):
+        response = self.guest_client.get(
+            reverse('api:posts'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), 5)
+        response = self.guest_client.get(
+            reverse('api:posts'), HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase
+from ..models import Comment, Follow, Post, UserCounter
+from ..synthetic import zipf_weights
+
+User = get_user_model()
+
+
+class BenchmarkCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data', users=40, groups=3, posts=400, comments=200,
+            follows_per_user=5, stdout=StringIO(),
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_generate_data_creates_requested_volume(self):
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+
+    def test_generate_data_popularity_is_skewed(self):
+        posts = sorted(
+            UserCounter.objects.values_list('posts_count', flat=True)
+        )
+        followers = sorted(
+            UserCounter.objects.values_list('followers_count', flat=True)
+        )
+        self.assertGreater(posts[-1], posts[len(posts) // 2] * 5)
+        self.assertGreater(followers[-1], followers[len(followers) // 2] * 2)
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')
+        ).exists())
+
+    def test_bench_views_writes_report(self):
+        path = os.path.join(self.directory, 'views.json')
+        call_command('bench_views', repeat=2, output=path, stdout=StringIO())
+        with open(path, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(report['kind'], 'views')
+        self.assertEqual(set(report['results']), {
+            'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+        })
+        for name, result in report['results'].items():
+            with self.subTest(view=name):
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_bench_views_fails_on_regression(self):
+        path = os.path.join(self.directory, 'baseline.json')
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump({'results': {'index': {'p50_ms': 0.0001}}}, stream)
+        with self.assertRaises(CommandError):
+            call_command(
+                'bench_views', repeat=2, baseline=path,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+
+    def test_bench_templates_measures_cost_per_post(self):
+        path = os.path.join(self.directory, 'templates.json')
+        call_command(
+            'bench_templates', repeat=2, output=path, stdout=StringIO()
+        )
+        with open(path, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(report['kind'], 'templates')
+        self.assertEqual(set(report['results']), {
+            f'{mode}_{size}'
+            for mode in ('cached', 'uncached')
+            for size in ('10', '100', 'per_post')
+        })
+        self.assertIn('post_us', report['results']['cached_per_post'])
+
+    def test_zipf_weights(self):
+        weights = zipf_weights(3, 1)
+        self.assertEqual(weights[0], 1)
+        self.assertAlmostEqual(weights[-1], 1 + 1 / 2 + 1 / 3)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from ..models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+
+class BulkCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост, "с кавычками"\nи переносом',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.author, text='Пост без группы')
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ответ')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def round_trip(self, extension):
+        models = ['group', 'post', 'comment', 'follow']
+        paths = {
+            model: os.path.join(self.directory, f'{model}.{extension}')
+            for model in models
+        }
+        for model in models:
+            call_command('export_posts', model, paths[model],
+                         stdout=StringIO(), stderr=StringIO())
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        for model in models:
+            call_command('import_posts', model, paths[model],
+                         batch_size=1, stdout=StringIO())
+
+    def assert_restored(self, posts, comments):
+        self.assertEqual(
+            list(Post.objects.values_list('pk', 'text', 'pub_date',
+                                          'group_id')),
+            posts,
+        )
+        self.assertEqual(
+            list(Comment.objects.values_list('pk', 'text', 'created')),
+            comments,
+        )
+        self.assertTrue(Follow.objects.filter(
+            user=BulkCommandsTest.user, author=BulkCommandsTest.author
+        ).exists())
+        counter = UserCounter.objects.get(user=BulkCommandsTest.author)
+        self.assertEqual(counter.posts_count, 2)
+        self.assertEqual(counter.followers_count, 1)
+        post = Post.objects.get(pk=BulkCommandsTest.post.pk)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_posts_ndjson_and_csv_round_trip(self):
+        posts = list(Post.objects.values_list('pk', 'text', 'pub_date',
+                                              'group_id'))
+        comments = list(Comment.objects.values_list('pk', 'text', 'created'))
+        for extension in ('ndjson', 'csv'):
+            with self.subTest(extension=extension):
+                self.round_trip(extension)
+                self.assert_restored(posts, comments)
@@ -0,0 +1,139 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage, S3Storage
+from ..models import Post
+from .test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name='small.gif', content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+def stored_files(root):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, names in os.walk(root) for name in names
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, True)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('posts/a.GIF', ContentFile(SMALL_GIF))
+        second = self.storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^posts/(\w\w)/(\w\w)/\1\2\w{60}\.gif$')
+        self.assertEqual(stored_files(TEMP_MEDIA_ROOT), [first])
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(StoredFile.objects.exists())
+
+    @override_settings(MEDIA_BACKEND='core.storage.S3Storage')
+    def test_s3_stand_in_backend(self):
+        name = self.storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        self.assertIsInstance(self.storage.backend, S3Storage)
+        bucket = settings.MEDIA_S3['BUCKET']
+        self.assertEqual(
+            stored_files(TEMP_MEDIA_ROOT), [os.path.join(bucket, name)]
+        )
+        self.assertEqual(
+            self.storage.url(name), f'{settings.MEDIA_URL}{bucket}/{name}'
+        )
+        self.assertEqual(self.storage.size(name), len(SMALL_GIF))
+        with self.storage.open(name) as content:
+            self.assertEqual(content.read(), SMALL_GIF)
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_upload_is_hashed_on_disk(self):
+        author = User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(author)
+        client.post(reverse('posts:post_create'), {
+            'text': 'Пост', 'image': upload(),
+        })
+        client.post(reverse('posts:post_create'), {
+            'text': 'Репост', 'image': upload('copy.gif'),
+        })
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(stored_files(TEMP_MEDIA_ROOT), list(names))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageReferencesTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, True)
+
+    def test_file_lives_while_posts_reference_it(self):
+        first = Post.objects.create(
+            author=self.author, text='Первый', image=upload()
+        )
+        second = Post.objects.create(
+            author=self.author, text='Второй', image=upload('copy.gif')
+        )
+        name = first.image.name
+        first.image = upload(
+            content=SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF')
+        )
+        first.save()
+        self.assertTrue(first.image.storage.exists(name))
+        second.delete()
+        self.assertFalse(first.image.storage.exists(name))
+        self.assertEqual(stored_files(TEMP_MEDIA_ROOT), [first.image.name])
+
+    def test_dedupe_media_moves_legacy_files(self):
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        for number in range(3):
+            legacy = f'posts/legacy_{number}.gif'
+            with open(os.path.join(TEMP_MEDIA_ROOT, legacy), 'wb') as file:
+                file.write(SMALL_GIF)
+            post = Post.objects.create(author=self.author, text='Пост')
+            Post.objects.filter(pk=post.pk).update(image=legacy)
+        call_command('dedupe_media', stdout=io.StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(stored_files(TEMP_MEDIA_ROOT), list(names))
+        self.assertEqual(StoredFile.objects.get().references, 3)
+
+    def test_same_bytes_replacing_image_keep_one_reference(self):
+        post = Post.objects.create(
+            author=self.author, text='Пост', image=upload()
+        )
+        name = post.image.name
+        post.image = upload('copy.gif')
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        post.delete()
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertEqual(stored_files(TEMP_MEDIA_ROOT), [])
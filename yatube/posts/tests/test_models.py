@@ -1,6 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
-from ..models import Group, Post, Follow
+from ..models import Group, Post, Follow, Comment, UserCounter
 
 User = get_user_model()
 
@@ -39,6 +44,13 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(value, expected_value)
 
+    def test_posts_follow_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(
+                user=PostModelTest.user,
+                author=PostModelTest.author,
+            )
+
     def test_posts_post_has_correct_verbose_name(self):
         post = PostModelTest.post
         verbose_names = {
@@ -87,3 +99,56 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 verbose = group._meta.get_field(field).help_text
                 self.assertEqual(verbose, help_text)
+
+
+class CounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def counter(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_posts_counters_follow_writes(self):
+        post = Post.objects.create(author=CounterTest.author, text='Пост')
+        Comment.objects.create(post=post, author=CounterTest.user, text='1')
+        Comment.objects.create(post=post, author=CounterTest.user, text='2')
+        Follow.objects.create(user=CounterTest.user, author=CounterTest.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(self.counter(CounterTest.author).posts_count, 1)
+        self.assertEqual(self.counter(CounterTest.author).followers_count, 1)
+        self.assertEqual(self.counter(CounterTest.user).following_count, 1)
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post.delete()
+        self.assertEqual(self.counter(CounterTest.author).posts_count, 0)
+
+    def test_posts_counters_follow_cascade_delete(self):
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=CounterTest.user, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='1')
+        Follow.objects.create(user=reader, author=CounterTest.user)
+        reader.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counter(CounterTest.user).followers_count, 0)
+
+    def test_posts_rebuild_counters_fixes_drift(self):
+        post = Post.objects.create(author=CounterTest.author, text='Пост')
+        UserCounter.objects.filter(user=CounterTest.author).update(
+            posts_count=10
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True,
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_counters', stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_counters', check=True,
+                     stdout=StringIO(), stderr=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counter(CounterTest.author).posts_count, 1)
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from ..models import Comment, Group, Post
+from ..page_cache import hole_marker
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+        cls.routes = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(AnonymousPageCacheTest.author)
+
+    def test_posts_anonymous_pages_served_from_cache(self):
+        for route in AnonymousPageCacheTest.routes:
+            with self.subTest(route=route):
+                first = self.guest_client.get(route)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(route)
+                self.assertEqual(second.templates, [])
+                self.assertEqual(second.content, first.content)
+                self.assertContains(second, 'Войти')
+                self.assertNotContains(second, '<!--hole:')
+
+    def test_posts_holes_are_personal(self):
+        route = reverse(
+            'posts:profile', kwargs={'username': 'author'}
+        )
+        self.guest_client.get(route)
+        response = self.authorized_client.get(route)
+        self.assertContains(response, 'Пользователь: author')
+        self.assertNotContains(response, 'Подписаться')
+        response = self.guest_client.get(route)
+        self.assertContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Выйти')
+
+    def test_posts_comment_form_only_for_users(self):
+        route = AnonymousPageCacheTest.routes[-1]
+        self.guest_client.get(route)
+        self.assertNotContains(self.guest_client.get(route), '<form')
+        self.assertContains(self.authorized_client.get(route), '<form')
+
+    def test_posts_writes_invalidate_pages(self):
+        for route in AnonymousPageCacheTest.routes:
+            self.guest_client.get(route)
+        post = AnonymousPageCacheTest.post
+        Post.objects.create(
+            text='Свежий пост',
+            author=AnonymousPageCacheTest.author,
+            group=AnonymousPageCacheTest.group,
+        )
+        Comment.objects.create(
+            post=post, author=AnonymousPageCacheTest.author, text='Ответ'
+        )
+        expected = {
+            AnonymousPageCacheTest.routes[0]: 'Свежий пост',
+            AnonymousPageCacheTest.routes[1]: 'Свежий пост',
+            AnonymousPageCacheTest.routes[2]: 'Всего постов: 2',
+            AnonymousPageCacheTest.routes[3]: 'Ответ',
+        }
+        for route, text in expected.items():
+            with self.subTest(route=route):
+                self.assertContains(self.guest_client.get(route), text)
+
+    def test_posts_group_change_invalidates_pages(self):
+        group = AnonymousPageCacheTest.group
+        route = AnonymousPageCacheTest.routes[1]
+        self.guest_client.get(route)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(self.guest_client.get(route), 'Новое название')
+
+    def test_posts_markers_in_user_text_are_not_expanded(self):
+        marker = hole_marker('includes/header.html', {})
+        Post.objects.create(text=marker, author=AnonymousPageCacheTest.author)
+        route = reverse('posts:index')
+        self.guest_client.get(route)
+        response = self.guest_client.get(route)
+        self.assertEqual(response.content.count(b'navbar-brand'), 1)
+
+    def test_posts_error_page_has_no_markers(self):
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertNotContains(response, '<!--hole:', status_code=404)
@@ -0,0 +1,235 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from django.urls import reverse
+from ..models import Comment, Group, Post, Follow
+from ..paginator import CursorPaginator
+from ..timeline import timeline_posts
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой',
+        )
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.routes = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+            reverse('posts:follow_index'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTest.user)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(text='Тестовый пост',
+                 author=FeedQueriesTest.author,
+                 group=FeedQueriesTest.group)
+            for _ in range(count)
+        )
+
+    def count_queries(self, route):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(route)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_posts_feed_queries_do_not_grow_with_page_size(self):
+        self.create_posts(1)
+        single = {route: self.count_queries(route)
+                  for route in FeedQueriesTest.routes}
+        self.create_posts(POSTS_PER_PAGE * 2)
+        for route in FeedQueriesTest.routes:
+            with self.subTest(route=route):
+                self.assertEqual(self.count_queries(route), single[route])
+
+    def test_posts_feed_has_fixed_number_of_queries(self):
+        self.create_posts(POSTS_PER_PAGE)
+        # Сессия и пользователь + запросы самой ленты + миниатюры.
+        expected = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list',
+                    kwargs={'slug': FeedQueriesTest.group.slug}): 5,
+            reverse('posts:profile',
+                    kwargs={'username': FeedQueriesTest.author.username}): 5,
+            reverse('posts:follow_index'): 4,
+        }
+        for route, queries in expected.items():
+            with self.subTest(route=route):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    self.authorized_client.get(route)
+
+    def test_posts_post_detail_queries_do_not_grow_with_comments(self):
+        post = Post.objects.create(text='Пост', author=FeedQueriesTest.author)
+        route = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        Comment.objects.create(post=post, author=FeedQueriesTest.user)
+        single = self.count_queries(route)
+        User.objects.bulk_create(
+            User(username=f'commenter{i}') for i in range(50)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author) for author in
+            User.objects.filter(username__startswith='commenter')
+        )
+        self.assertEqual(self.count_queries(route), single)
+
+
+class ProfileQueriesTest(TestCase):
+    """Автор, счётчики и подписка читателя читаются одним запросом."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой',
+        )
+        cls.user = User.objects.create_user(username='user')
+        # Не bulk_create: счётчик постов ведут сигналы.
+        for _ in range(POSTS_PER_PAGE + 1):
+            Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ProfileQueriesTest.user)
+
+    def route(self, name='profile', username='author'):
+        return reverse(f'posts:{name}', kwargs={'username': username})
+
+    def test_posts_profile_has_fixed_number_of_queries(self):
+        # Автор со счётчиками, страница постов, миниатюры.
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(self.route())
+        self.assertContains(response, 'Всего постов: 11')
+        Follow.objects.create(
+            user=ProfileQueriesTest.user, author=ProfileQueriesTest.author
+        )
+        cache.clear()
+        # + сессия и пользователь.
+        with self.assertNumQueries(5):
+            response = self.authorized_client.get(self.route())
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Подписчиков: 1')
+
+    def test_posts_unknown_author_is_not_found(self):
+        for name in ('profile', 'profile_follow', 'profile_unfollow'):
+            with self.subTest(name=name):
+                with self.assertNumQueries(3):
+                    response = self.authorized_client.get(
+                        self.route(name, 'nobody')
+                    )
+                self.assertEqual(response.status_code, 404)
+
+    def test_posts_header_follows_counters(self):
+        self.guest_client.get(self.route())
+        self.authorized_client.get(self.route())
+        self.authorized_client.get(self.route('profile_follow'))
+        self.assertContains(
+            self.guest_client.get(self.route()), 'Подписчиков: 1'
+        )
+        response = self.authorized_client.get(self.route('profile', 'user'))
+        self.assertContains(response, 'подписок: 1')
+        self.authorized_client.get(self.route('profile_unfollow'))
+        self.assertFalse(Follow.objects.exists())
+        self.assertContains(
+            self.guest_client.get(self.route()), 'Подписчиков: 0'
+        )
+
+    def test_posts_follow_twice_keeps_one_follow(self):
+        for _ in range(2):
+            self.authorized_client.get(self.route('profile_follow'))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.authorized_client.get(self.route('profile_unfollow'))
+        self.assertFalse(Follow.objects.exists())
+
+
+class FeedIndexTest(TestCase):
+    """Запросы лент читают таблицы по индексам, а не полным сканом."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def feed_page(self, queryset):
+        paginator = CursorPaginator(queryset, POSTS_PER_PAGE)
+        return paginator.object_list[:POSTS_PER_PAGE + 1]
+
+    @override_settings(TIMELINE_MODE='pull')
+    def test_posts_feed_queries_use_indexes(self):
+        queries = {
+            'index': self.feed_page(Post.objects.for_feed()),
+            'group': self.feed_page(
+                FeedIndexTest.group.posts.for_feed()
+            ),
+            'profile': self.feed_page(
+                FeedIndexTest.author.posts.for_feed()
+            ),
+            'follow': self.feed_page(timeline_posts(FeedIndexTest.user)[0]),
+            'comments': Comment.objects.filter(
+                post_id=1
+            ).order_by('created')[:POSTS_PER_PAGE],
+            'following': Follow.objects.filter(
+                user=FeedIndexTest.user, author=FeedIndexTest.author
+            ),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                plan = self.query_plan(queryset)
+                for step in plan:
+                    if step.startswith(('SCAN', 'SEARCH')):
+                        self.assertTrue(
+                            'INDEX' in step or 'PRIMARY KEY' in step,
+                            f'{name}: {plan}',
+                        )
+
+    def test_posts_single_source_feeds_need_no_sort(self):
+        queries = {
+            'index': self.feed_page(Post.objects.for_feed()),
+            'group': self.feed_page(FeedIndexTest.group.posts.for_feed()),
+            'profile': self.feed_page(FeedIndexTest.author.posts.for_feed()),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(query=name):
+                plan = self.query_plan(queryset)
+                self.assertFalse(
+                    any('TEMP B-TREE' in step for step in plan),
+                    f'{name}: {plan}',
+                )
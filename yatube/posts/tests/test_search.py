@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from ..models import Post
+from ..search import SearchResults, SimpleBackend, SqliteFTS5Backend
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Мороз и солнце; день чудесный!',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.author,
+            text='Солнце, солнце и ещё раз солнце',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_posts_search_finds_and_ranks_posts(self):
+        self.assertEqual(self.search('мороз'), [SearchTest.post])
+        self.assertEqual(
+            self.search('солнце'), [SearchTest.other_post, SearchTest.post]
+        )
+        self.assertEqual(self.search('мороз день'), [SearchTest.post])
+        self.assertEqual(self.search(''), [])
+
+    def test_posts_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"мороз" OR NOT *'), [])
+        self.assertEqual(self.search('мороз"'), [SearchTest.post])
+
+    def test_posts_search_index_follows_writes(self):
+        post = Post.objects.create(author=SearchTest.author, text='Вьюга')
+        self.assertEqual(self.search('вьюга'), [post])
+        post.text = 'Метель'
+        post.save()
+        self.assertEqual(self.search('вьюга'), [])
+        self.assertEqual(self.search('метель'), [post])
+        post.delete()
+        self.assertEqual(self.search('метель'), [])
+
+    def test_posts_search_is_paginated(self):
+        for _ in range(POSTS_PER_PAGE + 1):
+            Post.objects.create(author=SearchTest.author, text='Снег')
+        self.assertEqual(len(self.search('снег')), POSTS_PER_PAGE)
+        self.assertEqual(len(self.search('снег', page=2)), 1)
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'снег'}
+        )
+        self.assertContains(response, '?q=%D1%81%D0%BD%D0%B5%D0%B3&amp;page=2')
+
+    def test_posts_backends_agree(self):
+        # LIKE в SQLite не сравнивает кириллицу без учёта регистра.
+        for query in ('солнце', 'Мороз день', 'нет такого'):
+            with self.subTest(query=query):
+                fts = SearchResults(query, SqliteFTS5Backend())
+                simple = SearchResults(query, SimpleBackend())
+                self.assertEqual(fts.count(), simple.count())
+                self.assertEqual(set(fts[0:10]), set(simple[0:10]))
@@ -0,0 +1,137 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from ..models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class SyndicationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой',
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'Пост {number} <b>&</b>',
+            )
+            for number in range(3)
+        ]
+        Post.objects.create(author=cls.other, text='Без группы')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, name, fmt, **kwargs):
+        kwargs['fmt'] = fmt
+        response = self.guest_client.get(
+            reverse(f'posts:{name}', kwargs=kwargs)
+        )
+        if response.streaming:
+            return response, b''.join(response.streaming_content)
+        return response, response.content
+
+    def test_feeds_are_valid_documents(self):
+        _, content = self.get('index_feed', 'rss')
+        channel = ElementTree.fromstring(content).find('channel')
+        items = channel.findall('item')
+        self.assertEqual(len(items), 4)
+        self.assertEqual(
+            items[1].find('description').text, 'Пост 2 <b>&</b>'
+        )
+        _, content = self.get('group_feed', 'atom', slug='test')
+        entries = ElementTree.fromstring(content).findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(
+            entries[0].find(f'{ATOM}author/{ATOM}name').text, 'Лев Толстой'
+        )
+        response, content = self.get('profile_feed', 'json', username='other')
+        self.assertEqual(
+            response['Content-Type'], 'application/feed+json; charset=utf-8'
+        )
+        items = json.loads(content)['items']
+        self.assertEqual([item['content_text'] for item in items],
+                         ['Без группы'])
+
+    def test_empty_feeds_are_valid_documents(self):
+        Group.objects.create(title='Пустая', slug='empty')
+        _, content = self.get('group_feed', 'atom', slug='empty')
+        feed = ElementTree.fromstring(content)
+        self.assertEqual(feed.findall(f'{ATOM}entry'), [])
+        self.assertIsNotNone(
+            parse_datetime(feed.find(f'{ATOM}updated').text)
+        )
+        _, content = self.get('group_feed', 'rss', slug='empty')
+        channel = ElementTree.fromstring(content).find('channel')
+        self.assertTrue(channel.find('lastBuildDate').text)
+        _, content = self.get('group_feed', 'json', slug='empty')
+        self.assertEqual(json.loads(content)['items'], [])
+
+    def test_unknown_format_and_objects_are_not_found(self):
+        cases = (
+            ('index_feed', 'xml', {}),
+            ('group_feed', 'rss', {'slug': 'missing'}),
+            ('profile_feed', 'rss', {'username': 'nobody'}),
+        )
+        for name, fmt, kwargs in cases:
+            with self.subTest(name=name, fmt=fmt):
+                response, _ = self.get(name, fmt, **kwargs)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(SYNDICATION_ITEMS=2)
+    def test_feed_is_limited(self):
+        _, content = self.get('index_feed', 'json')
+        items = json.loads(content)['items']
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0]['content_text'], 'Без группы')
+
+    def test_feed_is_cached_until_new_post(self):
+        response, first = self.get('index_feed', 'rss')
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            response, cached = self.get('index_feed', 'rss')
+        self.assertFalse(response.streaming)
+        self.assertEqual(cached, first)
+        self.assertEqual(len(queries), 0)
+        Post.objects.create(author=SyndicationTest.author, text='Свежий')
+        _, content = self.get('index_feed', 'rss')
+        self.assertIn('Свежий', content.decode())
+
+    def test_feed_supports_conditional_get(self):
+        response, _ = self.get('index_feed', 'atom')
+        response = self.guest_client.get(
+            reverse('posts:index_feed', kwargs={'fmt': 'atom'}),
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_link_to_feeds(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:index_feed', kwargs={'fmt': 'atom'})
+        )
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'test'})
+        )
+        self.assertContains(response, reverse(
+            'posts:group_feed', kwargs={'slug': 'test', 'fmt': 'rss'}
+        ))
@@ -0,0 +1,103 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from ..models import Post, Thumbnail
+from ..thumbnails import VARIANTS, generate_thumbnails, is_stale
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=ThumbnailTest.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif',
+            ),
+        )
+
+    def test_posts_thumbnails_generated_for_every_variant(self):
+        self.assertTrue(is_stale(self.post))
+        generate_thumbnails(self.post)
+        self.assertFalse(is_stale(self.post))
+        self.assertEqual(
+            set(self.post.thumbnails.values_list('variant', flat=True)),
+            set(VARIANTS),
+        )
+
+    def test_posts_pages_use_precomputed_thumbnails(self):
+        generate_thumbnails(self.post)
+        thumbnail = self.post.thumbnails.get(variant='card')
+        routes = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for route in routes:
+            with self.subTest(route=route):
+                response = Client().get(route)
+                self.assertContains(response, thumbnail.url)
+
+    def test_posts_feeds_show_thumbnail_once_it_is_built(self):
+        routes = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[ThumbnailTest.author.username]),
+        ]
+        for route in routes:
+            self.assertContains(Client().get(route), self.post.image.url)
+        generate_thumbnails(self.post)
+        thumbnail = self.post.thumbnails.get(variant='card')
+        for route in routes:
+            with self.subTest(route=route):
+                response = Client().get(route)
+                self.assertContains(response, thumbnail.url)
+                self.assertNotContains(response, self.post.image.url)
+
+    def test_posts_pages_fall_back_to_original_image(self):
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, self.post.image.url)
+        self.assertFalse(Thumbnail.objects.exists())
+
+    def test_posts_new_image_makes_thumbnails_stale(self):
+        generate_thumbnails(self.post)
+        # Картинки хранятся по содержимому: нужна другая, не копия.
+        self.post.image = SimpleUploadedFile(
+            name='other.gif',
+            content=SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF'),
+            content_type='image/gif',
+        )
+        self.post.save()
+        self.assertTrue(is_stale(self.post))
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from ..models import Post, Follow, TimelineEntry
+from yatube.settings import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+@override_settings(TIMELINE_MODE='push', TASKS_EAGER=True)
+class TimelinePushTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelinePushTest.user)
+
+    def feed(self, **params):
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), params
+        )
+        return response.context['page_obj']
+
+    def test_posts_follow_backfills_and_unfollow_prunes(self):
+        Follow.objects.create(
+            user=TimelinePushTest.user,
+            author=TimelinePushTest.author,
+        )
+        self.assertIn(TimelinePushTest.old_post, self.feed())
+        Follow.objects.filter(user=TimelinePushTest.user).delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertNotIn(TimelinePushTest.old_post, self.feed())
+
+    def test_posts_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(
+            user=TimelinePushTest.user,
+            author=TimelinePushTest.author,
+        )
+        post = Post.objects.create(
+            author=TimelinePushTest.author,
+            text='Новый пост',
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelinePushTest.user, post=post
+        ).exists())
+        self.assertEqual(list(self.feed()), [post, TimelinePushTest.old_post])
+
+    def test_posts_pushed_feed_pages_by_cursor(self):
+        Follow.objects.create(
+            user=TimelinePushTest.user,
+            author=TimelinePushTest.author,
+        )
+        for _ in range(POSTS_PER_PAGE):
+            Post.objects.create(author=TimelinePushTest.author, text='Пост')
+        first = self.feed()
+        second = self.feed(cursor=first.next_cursor)
+        self.assertEqual(list(second), [TimelinePushTest.old_post])
+        self.assertEqual(
+            list(self.feed(cursor=second.previous_cursor)), list(first)
+        )
+
+
+@override_settings(
+    TIMELINE_MODE='hybrid', TIMELINE_FANOUT_LIMIT=1, TASKS_EAGER=True
+)
+class TimelineHybridTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.user = User.objects.create_user(username='user')
+        cls.fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.fan, author=cls.star)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineHybridTest.user)
+
+    def test_posts_heavy_author_is_pulled_on_read(self):
+        Follow.objects.create(
+            user=TimelineHybridTest.user,
+            author=TimelineHybridTest.star,
+        )
+        Follow.objects.create(
+            user=TimelineHybridTest.user,
+            author=TimelineHybridTest.author,
+        )
+        star_post = Post.objects.create(
+            author=TimelineHybridTest.star,
+            text='Пост звезды',
+        )
+        post = Post.objects.create(
+            author=TimelineHybridTest.author,
+            text='Обычный пост',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=star_post).exists()
+        )
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, star_post]
+        )
+
+    def test_posts_author_below_limit_is_fanned_out_again(self):
+        Follow.objects.create(
+            user=TimelineHybridTest.user,
+            author=TimelineHybridTest.star,
+        )
+        star_post = Post.objects.create(
+            author=TimelineHybridTest.star,
+            text='Пост звезды',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=star_post).exists()
+        )
+        Follow.objects.get(
+            user=TimelineHybridTest.fan,
+            author=TimelineHybridTest.star,
+        ).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineHybridTest.user, post=star_post
+        ).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [star_post])
@@ -8,7 +8,7 @@ from ..models import Group, Post, Follow, Comment
 from django.urls import reverse
 from django.conf import settings
 from ..forms import PostForm
-from yatube.settings import POSTS_PER_PAGE
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
@@ -58,6 +58,7 @@ class PostViewTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_author_client = Client()
         self.authorized_author_client.force_login(PostViewTest.author)
         self.authorized_client = Client()
@@ -86,6 +87,25 @@ class PostViewTest(TestCase):
                 response = self.authorized_author_client.get(reverse_name)
                 self.assertTemplateUsed(response, template)
 
+    def test_posts_card_escapes_text_and_links_author_and_group(self):
+        author = User.objects.create_user(
+            username='иван@почта', first_name='<b>Иван</b>'
+        )
+        post = Post.objects.create(
+            author=author, text='<script>alert(1)</script>',
+            group=PostViewTest.group,
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        for fragment in (
+            '<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>',
+            'Автор: &lt;b&gt;Иван&lt;/b&gt;',
+            f'href="{reverse("posts:profile", args=[author.username])}"',
+            f'href="{reverse("posts:post_detail", args=[post.pk])}"',
+            f'href="{reverse("posts:group_list", args=["test"])}"',
+        ):
+            with self.subTest(fragment=fragment):
+                self.assertContains(response, fragment)
+
     def test_posts_pages_show_correct_context(self):
         routes = [
             reverse('posts:index'),
@@ -197,15 +217,47 @@ class PostViewTest(TestCase):
         index_route = reverse('posts:index')
         post = Post.objects.create(
             author=PostViewTest.author,
-            text='Тестовый пост',
+            text='Кэшированный пост',
         )
         response = self.authorized_client.get(index_route)
-        post.delete()
+        # update() не шлёт сигналов, поэтому страница остаётся в кэше.
+        Post.objects.filter(pk=post.pk).update(text='Изменённый пост')
         response_2 = self.authorized_client.get(index_route)
         self.assertEqual(response.content, response_2.content)
-        cache.clear()
+        post.delete()
         response_3 = self.authorized_client.get(index_route)
-        self.assertNotEqual(response_2.content, response_3.content)
+        self.assertNotContains(response_3, 'Кэшированный пост')
+
+    def test_posts_feed_cache_invalidated_on_write(self):
+        routes = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': PostViewTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': PostViewTest.author.username}),
+        ]
+        for route in routes:
+            self.authorized_client.get(route)
+        Post.objects.create(
+            author=PostViewTest.author,
+            text='Свежий пост',
+            group=PostViewTest.group,
+        )
+        for route in routes:
+            with self.subTest(route=route):
+                response = self.authorized_client.get(route)
+                self.assertContains(response, 'Свежий пост')
+
+    def test_posts_follow_feed_cache_invalidated_on_follow(self):
+        follow_route = reverse('posts:follow_index')
+        response = self.authorized_client.get(follow_route)
+        self.assertNotContains(response, PostViewTest.post.text)
+        Follow.objects.create(
+            user=PostViewTest.user,
+            author=PostViewTest.author,
+        )
+        response = self.authorized_client.get(follow_route)
+        self.assertContains(response, PostViewTest.post.text)
 
 
 class PaginatorViewsTest(TestCase):
@@ -253,3 +305,252 @@ class PaginatorViewsTest(TestCase):
             response = self.authorized_author_client.get(reverse_page)
             with self.subTest(reverse_page=reverse_page):
                 self.assertEqual(len(response.context['page_obj']), posts_len)
+
+    def test_posts_cursor_pages_walk_whole_feed(self):
+        route = reverse('posts:index')
+        first = self.authorized_author_client.get(route).context['page_obj']
+        self.assertEqual(len(first), POSTS_PER_PAGE)
+        self.assertFalse(first.has_previous())
+        response = self.authorized_author_client.get(
+            route, {'cursor': first.next_cursor}
+        )
+        second = response.context['page_obj']
+        self.assertEqual(len(second), Post.objects.count() - POSTS_PER_PAGE)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+        response = self.authorized_author_client.get(
+            route, {'cursor': second.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(first))
+
+    def test_posts_feed_cache_varies_by_page(self):
+        route = reverse('posts:index')
+        first = self.authorized_author_client.get(route)
+        second = self.authorized_author_client.get(route, {'page': 2})
+        self.assertEqual(
+            second.content.count(b'<article>'),
+            Post.objects.count() - POSTS_PER_PAGE,
+        )
+        self.assertNotEqual(first.content, second.content)
+
+    def test_posts_broken_cursor_returns_first_page(self):
+        route = reverse('posts:index')
+        response = self.authorized_author_client.get(
+            route, {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_PER_PAGE)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        cls.comments = list(
+            Comment.objects.order_by('created', 'pk').values_list(
+                'text', flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_posts_post_detail_embeds_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        page = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in page],
+            self.comments[:COMMENTS_PER_PAGE],
+        )
+        self.assertContains(response, page.next_cursor)
+
+    def test_posts_comments_fragment_loads_next_page(self):
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            self.comments[COMMENTS_PER_PAGE:],
+        )
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_posts_comments_json(self):
+        route = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+        data = self.guest_client.get(route, {'format': 'json'}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            self.comments[:COMMENTS_PER_PAGE],
+        )
+        data = self.guest_client.get(
+            route, {'format': 'json', 'cursor': data['next_cursor']}
+        ).json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_posts_comments_of_unknown_post(self):
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+        cls.routes = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.author)
+
+    def assert_not_modified(self, client, route, response):
+        again = client.get(route, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.templates, [])
+        return again
+
+    def test_posts_repeat_request_is_not_modified(self):
+        for route in ConditionalGetTest.routes:
+            with self.subTest(route=route):
+                response = self.guest_client.get(route)
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertIn('public', response['Cache-Control'])
+                self.assert_not_modified(self.guest_client, route, response)
+                again = self.guest_client.get(
+                    route,
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                )
+                self.assertEqual(again.status_code, 304)
+
+    def test_posts_not_modified_skips_feed_queries(self):
+        route = reverse('posts:index')
+        response = self.guest_client.get(route)
+        with self.assertNumQueries(0):
+            self.assert_not_modified(self.guest_client, route, response)
+
+    def test_posts_etag_depends_on_user_and_page(self):
+        route = reverse('posts:index')
+        guest = self.guest_client.get(route)
+        author = self.authorized_client.get(route)
+        second = self.guest_client.get(route, {'page': 2})
+        self.assertIn('private', author['Cache-Control'])
+        self.assertEqual(
+            len({guest['ETag'], author['ETag'], second['ETag']}), 3
+        )
+
+    def test_posts_writes_change_validators(self):
+        responses = {
+            route: self.guest_client.get(route)
+            for route in ConditionalGetTest.routes
+        }
+        Post.objects.create(
+            text='Новый пост',
+            author=ConditionalGetTest.author,
+            group=ConditionalGetTest.group,
+        )
+        for route, response in responses.items():
+            with self.subTest(route=route):
+                again = self.guest_client.get(
+                    route, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(again.status_code, 200)
+
+    def test_posts_group_and_author_edits_change_validators(self):
+        group_route = reverse(
+            'posts:group_list', kwargs={'slug': ConditionalGetTest.group.slug}
+        )
+        post_route = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ConditionalGetTest.post.pk},
+        )
+        edits = {
+            'title': (ConditionalGetTest.group, 'title', 'Новое название'),
+            'first_name': (ConditionalGetTest.author, 'first_name', 'Лев'),
+        }
+        for name, (instance, field, value) in edits.items():
+            responses = {
+                route: self.guest_client.get(route)
+                for route in (group_route, post_route)
+            }
+            setattr(instance, field, value)
+            instance.save()
+            for route, response in responses.items():
+                with self.subTest(edit=name, route=route):
+                    again = self.guest_client.get(
+                        route, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    self.assertEqual(again.status_code, 200)
+
+    def test_posts_login_keeps_validators(self):
+        route = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ConditionalGetTest.post.pk},
+        )
+        response = self.guest_client.get(route)
+        Client().force_login(ConditionalGetTest.author)
+        self.assert_not_modified(self.guest_client, route, response)
+
+    def test_posts_login_again_changes_validators(self):
+        route = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ConditionalGetTest.post.pk},
+        )
+        response = self.authorized_client.get(route)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assert_not_modified(self.authorized_client, route, response)
+        self.authorized_client.logout()
+        self.authorized_client.force_login(ConditionalGetTest.author)
+        again = self.authorized_client.get(
+            route, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(again.status_code, 200)
+        self.assertFalse(again.has_header('Last-Modified'))
+
+    def test_posts_comment_changes_post_detail(self):
+        route = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': ConditionalGetTest.post.pk},
+        )
+        response = self.guest_client.get(route)
+        comment = Comment.objects.create(
+            post=ConditionalGetTest.post,
+            author=ConditionalGetTest.author,
+            text='Комментарий',
+        )
+        response = self.guest_client.get(
+            route, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, comment.text)
+        self.assert_not_modified(self.guest_client, route, response)
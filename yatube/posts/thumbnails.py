@@ -0,0 +1,55 @@
+"""Фоновое построение миниатюр картинок постов.
+
+Все геометрии, которые используют шаблоны, перечислены в VARIANTS.
+После сохранения поста с картинкой миниатюры строятся фоновой задачей
+(core.tasks), а шаблоны через {% post_thumbnail %} только читают
+готовые адреса.
+"""
+from core.tasks import task
+from sorl.thumbnail import get_thumbnail
+from .models import Post, Thumbnail
+
+VARIANTS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+
+def is_stale(post):
+    """Для картинки поста построены не все варианты."""
+    if not post.image:
+        return False
+    ready = Thumbnail.objects.filter(
+        post=post, source=post.image.name
+    ).count()
+    return ready < len(VARIANTS)
+
+
+def generate_thumbnails(post):
+    """Строит все варианты миниатюр поста и запоминает их адреса."""
+    if not post.image:
+        Thumbnail.objects.filter(post=post).delete()
+        return
+    for variant, (geometry, options) in VARIANTS.items():
+        image = get_thumbnail(post.image, geometry, **options)
+        Thumbnail.objects.update_or_create(
+            post=post,
+            variant=variant,
+            defaults={
+                'source': post.image.name,
+                'url': image.url,
+                'width': image.width,
+                'height': image.height,
+            },
+        )
+
+
+@task
+def generate_by_id(post_id):
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is not None:
+        generate_thumbnails(post)
+
+
+def schedule(post_id):
+    """Ставит построение миниатюр поста в очередь задач."""
+    return generate_by_id.delay(post_id)
@@ -0,0 +1,156 @@
+"""Лента подписок: чтение через JOIN (pull) или рассылка при записи (push).
+
+Режим задаётся settings.TIMELINE_MODE:
+
+* ``pull`` — лента строится запросом по posts_follow при каждом чтении;
+* ``push`` — новый пост раскладывается в TimelineEntry подписчиков
+  фоновой задачей;
+* ``hybrid`` — как push, но посты авторов, у которых больше
+  TIMELINE_FANOUT_LIMIT подписчиков, не рассылаются, а подмешиваются
+  при чтении. Когда подписчиков становится не больше порога, посты
+  автора раскладываются по лентам задачей refan_author.
+
+При переключении из pull нужно заполнить ленты командой rebuild_timelines.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F, Q
+from core.tasks import task
+from .feed_cache import bump_feed_version
+from .models import Follow, Post, TimelineEntry, UserCounter
+
+BATCH_SIZE = 500
+
+
+def mode():
+    return settings.TIMELINE_MODE
+
+
+def is_pulled(author_id):
+    """Посты автора не рассылаются, а читаются через JOIN."""
+    if mode() == 'pull':
+        return True
+    if mode() == 'push':
+        return False
+    return UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def _insert(entries):
+    # bulk_create сам превращает генератор в список, поэтому режем на
+    # пачки заранее: память не зависит от числа подписчиков.
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+@task
+def fan_out_by_id(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'pub_date'
+    ).first()
+    if post is not None:
+        fan_out(post)
+        # Ленты подписчиков могли закэшироваться до рассылки.
+        bump_feed_version()
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя посты нового автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def dropped_to_limit(author_id):
+    """У автора ровно TIMELINE_FANOUT_LIMIT подписчиков: после отписки
+    его посты снова рассылаются, а не подмешиваются при чтении."""
+    return mode() == 'hybrid' and UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+@task
+def refan_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    Посты, опубликованные, пока автор читался через JOIN, не попали в
+    TimelineEntry; без этого они пропали бы из лент, как только автор
+    перестал подмешиваться при чтении.
+    """
+    if is_pulled(author_id):
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    ))
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in followers.iterator()
+        for post_id, pub_date in posts
+    )
+    bump_feed_version()
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты пользователя посты автора, от которого он
+    отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def timeline_posts(user):
+    """Посты ленты подписок и поле даты, по которому её листать.
+
+    Если все авторы пользователя рассылаются, лента читается по индексу
+    TimelineEntry (user, pub_date); иначе к разосланным постам
+    подмешиваются посты «тяжёлых» авторов.
+    """
+    posts = Post.objects.for_feed()
+    if mode() == 'pull':
+        return posts.filter(author__following__user=user), 'pub_date'
+    if mode() == 'hybrid':
+        pulled_authors = list(Follow.objects.filter(
+            user=user,
+            author__counter__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list('author_id', flat=True))
+        if pulled_authors:
+            pushed = TimelineEntry.objects.filter(user=user).values('post')
+            return posts.filter(
+                Q(pk__in=pushed) | Q(author__in=pulled_authors)
+            ), 'pub_date'
+    # Аннотация переиспользует JOIN из filter(): условия курсора по
+    # timeline_entries__pub_date добавили бы второй JOIN и дубли.
+    return posts.filter(timeline_entries__user=user).annotate(
+        timeline_date=F('timeline_entries__pub_date')
+    ), 'timeline_date'
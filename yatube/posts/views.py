@@ -1,76 +1,185 @@
+from urllib.parse import urlencode
+
 from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
+from .paginator import CursorPaginator
+from .conditional import conditional_page
+from .feed_cache import feed_cache_context, tag_versions
+from .page_cache import add_page_tags, anonymous_page_cache
+from .timeline import timeline_posts
+from .search import SearchResults
 from django.contrib.auth.decorators import login_required
-from yatube.settings import POSTS_PER_PAGE
+from core.db import pins_primary, reads_from_replica, retry_write
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 
-def pagination(request, list):
-    paginator = Paginator(list, POSTS_PER_PAGE)
+def pagination(request, list, date_field='pub_date'):
+    """Keyset-пагинация по ?cursor=, ?page= оставлен для старых ссылок."""
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = Paginator(list, POSTS_PER_PAGE)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(list, POSTS_PER_PAGE, date_field)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
 
 
+@conditional_page('index')
+@anonymous_page_cache('posts')
+@reads_from_replica
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     context = {
         'page_obj': pagination(request, post_list),
+        **feed_cache_context(request, 'index'),
     }
     return render(request, template, context)
 
 
+@conditional_page('group_posts', tags=('group:{slug}',))
+@anonymous_page_cache('posts')
+@reads_from_replica
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.for_feed()
     context = {
         'group': group,
         'page_obj': pagination(request, post_list),
+        **feed_cache_context(request, 'group', group.pk),
     }
     return render(request, template, context)
 
 
+def load_author(request, username):
+    """Автор, его счётчики и подписан ли на него читатель — одним
+    запросом. Нет автора — 404."""
+    authors = User.objects.only(
+        'username', 'first_name', 'last_name'
+    ).annotate(
+        posts_count=Coalesce('counter__posts_count', 0),
+        followers_count=Coalesce('counter__followers_count', 0),
+        following_count=Coalesce('counter__following_count', 0),
+    )
+    if request.user.is_authenticated:
+        authors = authors.annotate(viewer_follows=Exists(
+            Follow.objects.filter(
+                user_id=request.user.id, author_id=OuterRef('pk')
+            )
+        ))
+    return get_object_or_404(authors, username=username)
+
+
+@conditional_page('profile', follow=True, tags=('profile:{username}',))
+@anonymous_page_cache('posts', 'profile:{username}')
+@reads_from_replica
 def profile(request, username):
     template = 'posts/profile.html'
-    author = User.objects.get(username=username)
-    post_list = author.posts.all()
-    following = author.following.filter(user__id=request.user.id).exists()
+    author = load_author(request, username)
+    post_list = Post.objects.filter(author_id=author.pk).for_feed()
+    # Шапка меняется с постами автора и подписками на него и его.
+    header_versions = tag_versions(
+        (f'author:{author.pk}', f'profile:{username}')
+    ).values()
     context = {
         'author': author,
         'page_obj': pagination(request, post_list),
-        'following': following,
+        'following': getattr(author, 'viewer_follows', False),
+        'header_version': ':'.join(map(str, header_versions)),
+        **feed_cache_context(request, 'profile', author.pk),
+    }
+    return render(request, template, context)
+
+
+@reads_from_replica
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
     }
     return render(request, template, context)
 
 
+def comment_page(post_id, cursor=None):
+    """Страница комментариев от старых к новым: на странице поста всегда
+    не больше COMMENTS_PER_PAGE, сколько бы их ни было."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, 'created', ascending=True
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+@conditional_page('post_detail', post=True)
+@anonymous_page_cache('post:{post_id}')
+@reads_from_replica
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.get(pk=post_id)
+    post = Post.objects.select_related(
+        'author__counter', 'group'
+    ).prefetch_related('thumbnails').get(pk=post_id)
+    add_page_tags(request, f'author:{post.author_id}')
+    if post.group_id:
+        add_page_tags(request, f'group:{post.group_id}')
     context = {
         'post': post,
+        'comments': comment_page(post_id, request.GET.get('comments')),
         'form': CommentForm(),
     }
     return render(request, template, context)
 
 
+@reads_from_replica
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или ?format=json."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comment_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+    context = {'post_id': post_id, 'comments': page}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@pins_primary
 def post_create(request):
     template = 'posts/create_post.html'
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES)
 
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            retry_write(post.save)
             return redirect('posts:profile', post.author)
     form = PostForm()
     return render(request, template, {'form': form})
 
 
 @login_required
+@pins_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     is_edit = True
@@ -94,6 +203,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pins_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -101,24 +211,27 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        retry_write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@reads_from_replica
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts, date_field = timeline_posts(request.user)
     context = {
-        'page_obj': pagination(request, posts)
+        'page_obj': pagination(request, posts, date_field),
+        **feed_cache_context(request, 'follow'),
     }
     return render(request, template, context)
 
 
 @login_required
+@pins_primary
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    if request.user != author:
+    author = load_author(request, username)
+    if request.user != author and not author.viewer_follows:
         Follow.objects.get_or_create(
             user=request.user,
             author=author,
@@ -127,10 +240,9 @@ def profile_follow(request, username):
 
 
 @login_required
+@pins_primary
 def profile_unfollow(request, username):
-    author = User.objects.get(username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).delete()
+    author = load_author(request, username)
+    if author.viewer_follows:
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
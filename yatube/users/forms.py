@@ -1,5 +1,7 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
+from django.template import loader
+from .tasks import send_email
 
 User = get_user_model()
 
@@ -8,3 +10,21 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = {'first_name', 'last_name', 'username', 'email'}
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо со ссылкой сброса собирается в запросе, а отправляется
+    фоновой задачей: ответ не ждёт почтового сервера."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(
+                html_email_template_name, context
+            )
+        send_email.delay(subject, body, from_email, [to_email], html_body)
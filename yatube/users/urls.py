@@ -1,6 +1,7 @@
 from django.contrib.auth.views import LogoutView, LoginView, PasswordResetView
 from django.urls import path
 from . import views
+from .forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -18,7 +19,7 @@ urlpatterns = [
     ),
     path(
         'password_reset/',
-        PasswordResetView.as_view(),
+        PasswordResetView.as_view(form_class=QueuedPasswordResetForm),
         name='password_reset',
     )
 ]
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,12 +63,25 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# Кэширующий загрузчик разбирает каждый шаблон один раз на процесс;
+# правки шаблонов видны только после перезапуска. По умолчанию включён
+# вне DEBUG, YATUBE_TEMPLATE_CACHE=1 или 0 задаёт явно.
+TEMPLATE_CACHE = os.environ.get(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': (
+                [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+                if TEMPLATE_CACHE else TEMPLATE_LOADERS
+            ),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -89,9 +103,52 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами; мёртвые закрывает
+        # core.db.check_connections в начале запроса.
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 60)),
+    }
+}
+
+# Реплики только для чтения: пути к копиям базы через запятую в
+# YATUBE_DB_REPLICAS. Публичные ленты и страницы читают с них, запись
+# и чтение сразу после записи — с default (core/db.py). В тестах
+# реплики смотрят в тестовую default.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db.PrimaryReplicaRouter']
+
+# Сколько секунд после записи клиент читает с default.
+REPLICA_PIN_SECONDS = 10
+
+# Проверять постоянные соединения в начале каждого запроса.
+CONN_HEALTH_CHECKS = True
+
+# PRAGMA для каждого нового соединения с SQLite (core/db.py). WAL пускает
+# читателей параллельно с писателем, busy_timeout заставляет писателей
+# ждать блокировку, а не падать с «database is locked». Пустой словарь —
+# умолчания SQLite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
 }
 
+# Повторы записи из view, если база всё же занята: число попыток и
+# первая пауза в секундах, дальше она удваивается.
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -126,6 +183,72 @@ USE_L10N = True
 USE_TZ = True
 
 POSTS_PER_PAGE = 10
+# Комментарии на странице поста; остальные догружаются по курсору.
+COMMENTS_PER_PAGE = 20
+
+# Движок полнотекстового поиска (posts/search.py). На базах без FTS5
+# подойдёт 'posts.search.SimpleBackend'.
+SEARCH_BACKEND = 'posts.search.SqliteFTS5Backend'
+
+# Замеры времени запросов (core/middleware.py): заголовок Server-Timing
+# и перцентили по view на /-/timing/ для staff.
+PERFORMANCE_TIMING = False
+PERFORMANCE_TIMING_WINDOW = 1000
+
+# Фоновые задачи (core/tasks.py): письма, миниатюры, рассылка постов по
+# лентам. Выполняет их manage.py run_tasks с TASK_WORKERS потоками;
+# упавшая задача повторяется через TASK_RETRY_DELAY секунд, потом
+# вдвое дольше и так до TASK_MAX_ATTEMPTS попыток. Задачу воркера,
+# пропавшего дольше чем на TASK_LOCK_TIMEOUT секунд, берёт другой.
+# TASKS_EAGER выполняет задачи сразу при постановке, без воркера.
+TASKS_EAGER = False
+TASK_WORKERS = 4
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_LOCK_TIMEOUT = 10 * 60
+
+# Потоки, в которых ASGI-приложение (yatube/asgi.py) выполняет view;
+# соединения с клиентами держит цикл событий и в это число не входят.
+ASGI_THREADS = int(os.environ.get('YATUBE_ASGI_THREADS', 8))
+
+# Страницы лент сбрасываются сигналами при записи постов,
+# поэтому TTL может быть длинным.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Cache-Control страниц с условным GET (posts/conditional.py). Анонимам
+# отдаётся public, вошедшим — private. max_age=0 заставляет браузер
+# переспрашивать страницу каждый раз и получать дешёвый 304.
+CACHE_CONTROL = {
+    'index': {'max_age': 0},
+    'group_posts': {'max_age': 0},
+    'profile': {'max_age': 0},
+    'post_detail': {'max_age': 0},
+    'api_posts': {'max_age': 0},
+    'api_post': {'max_age': 0},
+    'api_follow': {'max_age': 0},
+    # Читалки опрашивают ленты по расписанию: пять минут без запросов.
+    'syndication': {'max_age': 300},
+}
+
+# Наибольший ?limit= страниц JSON API (posts/api.py).
+API_MAX_PAGE_SIZE = 100
+
+# RSS, Atom и JSON Feed (posts/syndication.py): число постов в ленте и
+# TTL готовых документов в кэше; при записи постов они сбрасываются.
+SYNDICATION_ITEMS = 50
+SYNDICATION_CACHE_TIMEOUT = 60 * 60
+
+# Кэш целых страниц для анонимов (posts/page_cache.py); 0 отключает.
+# Страницы сбрасываются по тегам при записи, TTL лишь ограничивает
+# память.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Лента подписок: 'pull', 'push' или 'hybrid' (см. posts/timeline.py).
+# После перехода с 'pull' выполните manage.py rebuild_timelines.
+TIMELINE_MODE = 'pull'
+# В режиме 'hybrid' посты авторов с большим числом подписчиков
+# не рассылаются, а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
@@ -148,8 +271,46 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Картинки постов хранятся по хешу содержимого (core/storage.py):
+# повторная загрузка того же файла не занимает места. MEDIA_BACKEND —
+# где лежат байты: FileSystemStorage в MEDIA_ROOT или
+# core.storage.S3Storage. Без ENDPOINT_URL S3Storage пишет в локальную
+# замену S3 в MEDIA_ROOT/<BUCKET>, с ним — в S3 через boto3.
+MEDIA_BACKEND = os.environ.get(
+    'YATUBE_MEDIA_BACKEND', 'django.core.files.storage.FileSystemStorage'
+)
+MEDIA_S3 = {
+    'BUCKET': os.environ.get('YATUBE_S3_BUCKET', 'yatube-media'),
+    'ENDPOINT_URL': os.environ.get('YATUBE_S3_ENDPOINT_URL'),
+    # Адрес CDN или публичного бакета для ссылок на файлы.
+    'PUBLIC_URL': os.environ.get('YATUBE_S3_PUBLIC_URL'),
+}
+
+# Загрузки всегда пишутся во временный файл и хешируются по пути, даже
+# маленькие: в памяти держится только текущий кусок. Если каталог для
+# временных файлов на том же диске, что MEDIA_ROOT, сохранение —
+# переименование без копирования.
+FILE_UPLOAD_HANDLERS = ['core.storage.HashingUploadHandler']
+FILE_UPLOAD_TEMP_DIR = os.environ.get('YATUBE_UPLOAD_TEMP_DIR')
+
+# Отдача MEDIA_ROOT (core/media.py). MEDIA_ACCEL передаёт сам файл
+# фронтовому прокси: 'x-accel-redirect' для nginx (internal location
+# MEDIA_ACCEL_PREFIX смотрит в MEDIA_ROOT) или 'x-sendfile' для Apache и
+# lighttpd. Без него файлы отдаёт Django через FileResponse.
+MEDIA_ACCEL = os.environ.get('YATUBE_MEDIA_ACCEL')
+MEDIA_ACCEL_PREFIX = '/internal-media/'
+# Файлы с хешем содержимого в имени (картинки постов, миниатюры) не
+# меняются и кэшируются на год, остальные — на час.
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MEDIA_MAX_AGE = 60 * 60
+
+# Кэш, общий для всех воркеров: файл SQLite из YATUBE_CACHE_PATH
+# (core/cache.py). Без переменной — база в памяти процесса, как у
+# LocMemCache: для разработки и тестов. Подойдёт и любой другой
+# бэкенд Django, например memcached.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_PATH', ':memory:'),
     }
 }